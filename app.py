@@ -4,9 +4,19 @@ Flask Web Application for Shop Details
 """
 
 from flask import Flask, render_template, request, redirect, url_for, flash, session, g, send_from_directory, jsonify
-from database import db, Shop, Category, Tag, ShopTag
+from flask import Response, stream_with_context
+from database import db, Shop, Category, Tag, ShopTag, REPLICA_BIND_PREFIX
+from page_cache import PageCache
+from metrics import Metrics
+from profiler import RequestProfiler
+from warmup import warm_up
+import migrations
 from sqlalchemy import or_
 from flask_babel import Babel, _
+import csv
+import datetime
+import io
+import json
 import os
 import sys
 
@@ -20,6 +30,7 @@ if python_dir not in sys.path:
     sys.path.append(python_dir)
 
 import config
+from suggest import Suggester
 
 from werkzeug.utils import secure_filename
 import uuid
@@ -38,8 +49,27 @@ app.config['SECRET_KEY'] = 'dev-key-please-change'
 # Database configuration from central config
 app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.SQLALCHEMY_ENGINE_OPTIONS
+app.config['SQLALCHEMY_BINDS'] = {
+    f'{REPLICA_BIND_PREFIX}{i}': uri for i, uri in enumerate(config.READ_REPLICA_URIS)
+}
 app.config['UPLOAD_FOLDER'] = config.UPLOAD_FOLDER if hasattr(config, 'UPLOAD_FOLDER') else UPLOAD_FOLDER
 
+# Rendered page cache
+app.config['PAGE_CACHE_ENABLED'] = config.PAGE_CACHE_ENABLED
+app.config['PAGE_CACHE_BACKEND'] = config.PAGE_CACHE_BACKEND
+app.config['PAGE_CACHE_DIR'] = config.PAGE_CACHE_DIR
+app.config['PAGE_CACHE_MAX_ENTRIES'] = config.PAGE_CACHE_MAX_ENTRIES
+
+app.config['SEARCH_BATCH_MAX_QUERIES'] = config.SEARCH_BATCH_MAX_QUERIES
+app.config['SUGGEST_MAX_LIMIT'] = config.SUGGEST_MAX_LIMIT
+app.config['SLOW_REQUEST_LOG_MS'] = config.SLOW_REQUEST_LOG_MS
+app.config['PROFILE_SAMPLE_RATE'] = config.PROFILE_SAMPLE_RATE
+app.config['PROFILE_HEADER'] = config.PROFILE_HEADER
+app.config['PROFILE_TOKEN'] = config.PROFILE_TOKEN
+app.config['PROFILE_INTERVAL_MS'] = config.PROFILE_INTERVAL_MS
+app.config['PROFILE_DIR'] = config.PROFILE_DIR
+
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -57,19 +87,15 @@ def get_locale():
 babel = Babel(app, locale_selector=get_locale)
 
 db.init_app(app)
+page_cache = PageCache(app, db)
+metrics = Metrics(app)
+profiler = RequestProfiler(app)
+suggester = Suggester(app, db)
 
 with app.app_context():
-    db.create_all()
-    # Auto-migrate: Add visiting_card column if it doesn't exist
-    from sqlalchemy import text
-    try:
-        with db.engine.connect() as conn:
-            conn.execute(text("SELECT visiting_card FROM shops LIMIT 1"))
-    except Exception:
-        with db.engine.connect() as conn:
-            conn.execute(text("ALTER TABLE shops ADD COLUMN visiting_card VARCHAR(5000)"))
-            conn.commit()
-            print("Migration: Added 'visiting_card' column to shops table.")
+    # Schema changes are applied once per deploy by `python migrations.py`;
+    # workers only check the recorded version and never run DDL at boot
+    migrations.verify(db.engine)
 
 
 @app.context_processor
@@ -100,6 +126,15 @@ def shop_img(filename):
     """Serve visiting card images from shop_img folder"""
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
+@app.route('/healthz')
+def healthz():
+    """Readiness probe; only reachable once warm-up has finished"""
+    return jsonify({
+        'status': 'ok',
+        'warmup_seconds': app.config.get('WARMUP_SECONDS'),
+        'db_routing': dict(db.routing_counts)
+    })
+
 @app.route('/set_lang/<lang_code>')
 def set_language(lang_code):
     if lang_code in ['en', 'bn']:
@@ -127,6 +162,7 @@ def index():
 
 
 @app.route('/shops')
+@page_cache.cached('shops', 'categories')
 def shop_list():
     """List all shops with pagination"""
     page = request.args.get('page', 1, type=int)
@@ -148,6 +184,7 @@ def shop_list():
 
 
 @app.route('/category/<int:category_id>')
+@page_cache.cached('category:{category_id}', 'categories')
 def category_shops(category_id):
     """List shops in a category"""
     shops = db.get_shops_by_category(category_id)
@@ -164,6 +201,7 @@ def category_shops(category_id):
 
 
 @app.route('/shop/<int:shop_id>')
+@page_cache.cached('shop:{shop_id}', 'categories')
 def shop_detail(shop_id):
     """View single shop details"""
     shop = db.get_shop_by_id(shop_id)
@@ -310,10 +348,41 @@ def delete_shop(shop_id):
 def api_search():
     """API endpoint for search"""
     query = request.args.get('q', '')
-    shops = db.search_shops(query) if query else []
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    shops = db.search_shops(query, limit) if query else []
     return jsonify(shops)
 
 
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """API endpoint for many searches in one request"""
+    data = request.get_json(silent=True)
+    queries = data.get('queries') if isinstance(data, dict) else data
+
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({'error': 'queries must be a list of strings'}), 400
+    if len(queries) > app.config['SEARCH_BATCH_MAX_QUERIES']:
+        return jsonify({'error': f"At most {app.config['SEARCH_BATCH_MAX_QUERIES']} queries per batch"}), 400
+
+    limit = data.get('limit') if isinstance(data, dict) else None
+    # bool is an int subclass: reject true/false rather than treat them as 1/0
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 1):
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+
+    results = db.search_shops_batch(queries, limit)
+    return jsonify({'results': [{'query': q, 'shops': shops} for q, shops in zip(queries, results)]})
+
+
+@app.route('/api/suggest')
+def api_suggest():
+    """API endpoint for search box autocomplete"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 8, type=int)
+    return jsonify({'query': query, 'suggestions': suggester.suggest(query, limit)})
+
+
 @app.route('/api/shops')
 def api_shops():
     """API endpoint for all shops"""
@@ -332,6 +401,67 @@ def api_shops():
     })
 
 
+EXPORT_COLUMNS = ['id', 'category_id', 'category_name', 'category_name_english', 'serial_no', 'name',
+                  'proprietor', 'address', 'mobile', 'transaction_status', 'whatsapp', 'email_web',
+                  'products', 'visiting_card', 'created_at', 'updated_at', 'tags']
+
+
+def _ndjson_lines(shops):
+    for shop in shops:
+        yield json.dumps(shop, ensure_ascii=False, sort_keys=True) + '\n'
+
+
+def _csv_lines(shops):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+    for shop in shops:
+        shop['tags'] = ', '.join(t['name'] for t in shop['tags'])
+        writer.writerow([shop[column] for column in EXPORT_COLUMNS])
+        yield flush()
+
+
+@app.route('/api/shops/export')
+def api_shops_export():
+    """Stream the whole directory as NDJSON (default) or CSV"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    updated_since = request.args.get('updated_since')
+    if updated_since:
+        try:
+            updated_since = datetime.datetime.fromisoformat(updated_since)
+        except ValueError:
+            return jsonify({'error': 'updated_since must be an ISO 8601 timestamp'}), 400
+        if updated_since.tzinfo is not None:
+            # updated_at is stored as naive local time (datetime.now)
+            updated_since = updated_since.astimezone().replace(tzinfo=None)
+
+    shops = db.export_shops(updated_since or None)
+    if export_format == 'csv':
+        return Response(stream_with_context(_csv_lines(shops)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=shops.csv'})
+    return Response(stream_with_context(_ndjson_lines(shops)), mimetype='application/x-ndjson')
+
+
+@app.route('/api/changes')
+def api_changes():
+    """API endpoint for the change feed (delta sync for mirrors)"""
+    since = request.args.get('since', 0, type=int)
+    limit = max(1, min(request.args.get('limit', 1000, type=int), 1000))
+    changes, last_seq, has_more = db.get_changes(since, limit)
+    return jsonify({'changes': changes, 'since': last_seq, 'has_more': has_more})
+
+
 # ==================== TAG API ROUTES ====================
 
 @app.route('/api/tags')
@@ -435,5 +565,10 @@ def service_detail(service_alias):
         return redirect(url_for('services'))
 
 
+# Finish warm-up before the worker starts accepting requests
+if config.WARMUP_ON_START:
+    warm_up(app, db)
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5020)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Async JSON API for /api/search, /api/shops and /api/tags.
+
+A plain ASGI application over an async SQLAlchemy engine. It reuses the
+session-level queries in database.py (run inside AsyncSession.run_sync) and
+moves CPU-bound search scoring off the event loop into an executor, so slow
+searches do not hold up other requests. Responses match the Flask views.
+
+Needs an ASGI server and an async driver (aiosqlite for SQLite, asyncpg for
+PostgreSQL):
+
+    uvicorn asgi_api:app --workers 4 --port 5021
+"""
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+# search_engine / semantic_search live in python/
+basedir = os.path.abspath(os.path.dirname(__file__))
+python_dir = os.path.join(basedir, 'python')
+if python_dir not in sys.path:
+    sys.path.append(python_dir)
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import config
+from database import (tune_engine, query_shops_page, query_shops_count, query_all_tags, query_generations,
+                      query_shops_by_ids, prepare_search, query_search_candidates, rank_search_candidates,
+                      CorpusRankers)
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+_engine = None
+_sessionmaker = None
+_executor = ThreadPoolExecutor(max_workers=config.ASYNC_SCORING_WORKERS,
+                               thread_name_prefix='search-scoring')
+# Same SEARCH_SCORER / parallel scoring selection as search_shops
+_rankers = CorpusRankers()
+
+
+def async_database_uri(uri):
+    """Swap the sync driver in a database URI for its async counterpart"""
+    scheme, rest = uri.split('://', 1)
+    dialect = scheme.split('+', 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{dialect}'")
+    return f'{ASYNC_DRIVERS[dialect]}://{rest}'
+
+
+def get_sessionmaker():
+    global _engine, _sessionmaker
+    if _sessionmaker is None:
+        uri = config.SQLALCHEMY_DATABASE_URI
+        options = config.SQLALCHEMY_ENGINE_OPTIONS if ':memory:' not in uri else {}
+        _engine = create_async_engine(async_database_uri(uri), **options)
+        tune_engine(_engine.sync_engine)
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+    return _sessionmaker
+
+
+async def run_in_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+def _int_arg(params, name, default):
+    """request.args.get(name, default, type=int)"""
+    try:
+        return int(params[name][0])
+    except (KeyError, IndexError, ValueError):
+        return default
+
+
+def _load_ranker_rows(session):
+    generation = query_generations(session, ['shops'])['shops']
+    return generation, _rankers.load_rows(session, generation)
+
+
+async def api_search(params):
+    query = params.get('q', [''])[0]
+    limit = _int_arg(params, 'limit', None)
+    if limit is not None and limit < 1:
+        return 400, {'error': 'limit must be a positive integer'}
+    if not query:
+        return []
+    prepared = await run_in_executor(prepare_search, query)
+    if prepared is None:
+        return []
+    normalized_query, query_tokens, semantic_scores, fuzzy = prepared
+
+    async with get_sessionmaker()() as session:
+        ranker = None
+        if _rankers.enabled():
+            generation, rows = await session.run_sync(_load_ranker_rows)
+            # Building the scorer or publishing a new corpus is CPU-bound; keep it off the loop
+            ranker = (_rankers.build(generation) if rows is None
+                      else await run_in_executor(_rankers.build, generation, rows))
+        if ranker is not None:
+            shop_ids = await run_in_executor(
+                lambda: ranker.rank(query_tokens, normalized_query, semantic_scores, limit=limit, fuzzy=fuzzy))
+            ranked = await session.run_sync(query_shops_by_ids, shop_ids)
+        else:
+            shops = await session.run_sync(
+                query_search_candidates, query_tokens, normalized_query, semantic_scores, fuzzy)
+            ranked = await run_in_executor(
+                rank_search_candidates, shops, query_tokens, normalized_query, semantic_scores, fuzzy)
+            ranked = ranked[:limit]
+        return await session.run_sync(lambda _: [shop.to_dict() for shop in ranked])
+
+
+async def api_shops(params):
+    page = _int_arg(params, 'page', 1)
+    per_page = _int_arg(params, 'per_page', 20)
+    offset = (page - 1) * per_page
+
+    async with get_sessionmaker()() as session:
+        shops = await session.run_sync(query_shops_page, per_page, offset)
+        total = await session.run_sync(query_shops_count)
+
+    return {
+        'shops': shops,
+        'total': total,
+        'page': page,
+        'per_page': per_page
+    }
+
+
+async def api_tags(params):
+    async with get_sessionmaker()() as session:
+        tags = await session.run_sync(query_all_tags)
+    return {'tags': tags}
+
+
+ROUTES = {
+    '/api/search': api_search,
+    '/api/shops': api_shops,
+    '/api/tags': api_tags,
+}
+
+
+async def _send_json(send, status, payload, head=False):
+    # Same encoding as Flask's jsonify
+    body = json.dumps(payload, sort_keys=True).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        ],
+    })
+    # HEAD keeps the GET headers (content-length included) but sends no body
+    await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            get_sessionmaker()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _engine is not None:
+                await _engine.dispose()
+            _executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    head = scope['method'] == 'HEAD'
+    handler = ROUTES.get(scope['path'])
+    if handler is None:
+        return await _send_json(send, 404, {'error': 'Not found'}, head)
+    if scope['method'] not in ('GET', 'HEAD'):
+        return await _send_json(send, 405, {'error': 'Method not allowed'})
+
+    params = parse_qs(scope['query_string'].decode('utf-8'))
+    result = await handler(params)
+    # Handlers return a payload, or (status, payload) like a Flask view
+    status, payload = result if isinstance(result, tuple) else (200, result)
+    await _send_json(send, status, payload, head)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi_api:app', host='0.0.0.0', port=5021)
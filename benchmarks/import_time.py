@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the search stack.
+
+Each target runs several times in a fresh interpreter; the median wall time
+is reported together with the heavy libraries it ended up loading. A target
+that loads a library it must not (pandas, scikit-learn or the Flask/SQLAlchemy
+stack on the semantic query path) fails the run:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --baseline benchmarks/results/import-abc1234.json
+    python benchmarks/import_time.py --detail semantic_search   # python -X importtime, top 15
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+HEAVY_MODULES = ['numpy', 'scipy', 'pandas', 'sklearn', 'flask', 'sqlalchemy']
+
+# name -> (statement timed in a fresh interpreter, heavy modules it must not load)
+TARGETS = {
+    'search_engine': ("import search_engine", ['numpy', 'pandas', 'sklearn']),
+    'semantic_search': ("import semantic_search", ['pandas', 'sklearn', 'flask', 'sqlalchemy']),
+    'semantic_query': ("import semantic_search; semantic_search.get_semantic_search().search('pipe')",
+                       ['pandas', 'sklearn', 'flask', 'sqlalchemy']),
+    'database': ("import database", ['numpy', 'pandas', 'sklearn']),
+    'app': ("import config; config.WARMUP_ON_START = False; import app", ['pandas', 'sklearn']),
+}
+
+_CHILD = """
+import json, os, sys, time, warnings
+warnings.simplefilter('ignore')
+sys.path[:0] = [{base!r}, {python!r}]
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _child_source(statement):
+    return _CHILD.format(base=BASE_DIR, python=os.path.join(BASE_DIR, 'python'),
+                         statement=statement, heavy=HEAVY_MODULES)
+
+
+def measure(name, repeat):
+    statement, forbidden = TARGETS[name]
+    samples, loaded = [], []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', _child_source(statement)], cwd=BASE_DIR,
+                                check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        summary = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(summary['seconds'])
+        loaded = summary['loaded']
+    return {
+        'target': name,
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'min_ms': round(min(samples) * 1000, 1),
+        'loaded': loaded,
+        'forbidden_loaded': [m for m in forbidden if m in loaded],
+    }
+
+
+def print_detail(name, top=15):
+    """Slowest modules by cumulative import time (python -X importtime)"""
+    statement, _ = TARGETS[name]
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _child_source(statement)], cwd=BASE_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:       self |  cumulative | module"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|')
+        rows.append((int(cumulative_us), module.rstrip()))
+    print(f"\nSlowest imports for {name} (cumulative ms):")
+    for cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:>9.1f}  {module}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['target']: r for r in json.load(f)['results']}
+    print(f"\nChange against {baseline_path}:")
+    for r in results:
+        old = baseline.get(r['target'])
+        if old is None or not old['median_ms']:
+            continue
+        print(f"  {r['target']:<16} {r['median_ms'] - old['median_ms']:+8.1f} ms "
+              f"({(r['median_ms'] / old['median_ms'] - 1) * 100:+6.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time of the search stack.")
+    parser.add_argument('--targets', default=','.join(TARGETS), help="comma separated targets")
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument('--detail', help="print the slowest imports of one target")
+    parser.add_argument('-o', '--output', help="results JSON (default: benchmarks/results/import-<commit>.json)")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    if args.detail:
+        print_detail(args.detail)
+        return 0
+
+    results = []
+    print(f"{'target':<16} {'median ms':>10} {'min ms':>8}  loaded")
+    for name in [t for t in args.targets.split(',') if t]:
+        result = measure(name, args.repeat)
+        results.append(result)
+        print(f"{name:<16} {result['median_ms']:>10.1f} {result['min_ms']:>8.1f}  {', '.join(result['loaded']) or '-'}")
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f'import-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+
+    failed = [r for r in results if r['forbidden_loaded']]
+    for r in failed:
+        print(f"FAIL: {r['target']} loaded {', '.join(r['forbidden_loaded'])}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Relevance and latency regression check for search_shops.
+
+benchmarks/golden_queries.json groups queries that mean the same thing:
+Bengali spelling variants (বেয়ারিং / বিয়ারিং) and DOMAIN_MAP English /
+Bengali pairs. Every query in a group expects the same top-N shop ids,
+taken from the group's reference spelling. The check reports NDCG@N and
+recall@N per query next to its latency, and fails when the mean NDCG or
+recall drops below the baseline stored in the golden file:
+
+    python benchmarks/relevance.py
+    python benchmarks/relevance.py -o /tmp/relevance.json --baseline old.json
+
+After an intended ranking change, review the output and record it with
+--regenerate (expected ids and baseline) or --update-baseline (baseline only).
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+for path in (BASE_DIR, os.path.join(BASE_DIR, 'python')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+GOLDEN_PATH = os.path.join(BENCH_DIR, 'golden_queries.json')
+TOLERANCE = 0.005
+
+
+def ndcg(ranked, expected, top_n):
+    """NDCG@top_n with graded gains: expected[0] is worth len(expected), the last one 1"""
+    gains = {shop_id: len(expected) - i for i, shop_id in enumerate(expected)}
+    dcg = sum(gains.get(shop_id, 0) / math.log2(i + 2) for i, shop_id in enumerate(ranked[:top_n]))
+    ideal = sum(gain / math.log2(i + 2) for i, gain in enumerate(sorted(gains.values(), reverse=True)[:top_n]))
+    return dcg / ideal if ideal else 1.0
+
+
+def recall(ranked, expected, top_n):
+    if not expected:
+        return 1.0
+    return len(set(ranked[:top_n]) & set(expected)) / len(expected)
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def evaluate(golden, search):
+    """Run every golden query through search(query) -> [shop ids]"""
+    top_n = golden['top_n']
+    rows = []
+    for group in golden['groups']:
+        for item in group['queries']:
+            start = time.perf_counter()
+            ranked = search(item['query'])
+            latency = time.perf_counter() - start
+            rows.append({
+                'group': group['name'],
+                'query': item['query'],
+                'ndcg': round(ndcg(ranked, item['expected'], top_n), 4),
+                'recall': round(recall(ranked, item['expected'], top_n), 4),
+                'latency_ms': round(latency * 1000, 3),
+                'top': ranked[:top_n],
+            })
+
+    latencies = sorted(r['latency_ms'] for r in rows)
+    summary = {
+        'queries': len(rows),
+        'ndcg': round(sum(r['ndcg'] for r in rows) / len(rows), 4),
+        'recall': round(sum(r['recall'] for r in rows) / len(rows), 4),
+        'p50_ms': _percentile(latencies, 0.50),
+        'p95_ms': _percentile(latencies, 0.95),
+        'max_ms': latencies[-1],
+    }
+    return summary, rows
+
+
+def regenerate(golden, search):
+    """Expected ids of every query := current top-N of its group's reference query"""
+    for group in golden['groups']:
+        expected = search(group['reference'])[:golden['top_n']]
+        for item in group['queries']:
+            item['expected'] = expected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check search relevance and latency against golden queries.")
+    parser.add_argument('--golden', default=GOLDEN_PATH)
+    parser.add_argument('-o', '--output', help="write summary and per-query results as JSON")
+    parser.add_argument('--baseline', help="earlier --output file to compare latency against")
+    parser.add_argument('--regenerate', action='store_true',
+                        help="recompute expected ids from the reference queries and store the baseline")
+    parser.add_argument('--update-baseline', action='store_true', help="store the current scores as the baseline")
+    parser.add_argument('-v', '--verbose', action='store_true', help="print every query, not only regressions")
+    args = parser.parse_args(argv)
+
+    import config
+    config.WARMUP_ON_START = False
+    from app import app, db
+
+    with open(args.golden, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+
+    with app.app_context():
+        def search(query):
+            return [shop['id'] for shop in db.search_shops(query)]
+
+        search(golden['groups'][0]['reference'])  # load the semantic index outside the timings
+        if args.regenerate:
+            regenerate(golden, search)
+        summary, rows = evaluate(golden, search)
+
+    for row in rows:
+        if args.verbose or row['ndcg'] < 1 or row['recall'] < 1:
+            print(f"{row['group']:<14} {row['query']:<22} ndcg {row['ndcg']:.3f}  recall {row['recall']:.3f}  "
+                  f"{row['latency_ms']:8.2f} ms")
+    print(f"\n{summary['queries']} queries: NDCG@{golden['top_n']} {summary['ndcg']:.4f}, "
+          f"recall@{golden['top_n']} {summary['recall']:.4f}, "
+          f"latency p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'queries': rows}, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            old = json.load(f)['summary']
+        for key in ('ndcg', 'recall', 'p50_ms', 'p95_ms'):
+            print(f"  {key:<7} {old[key]:>9} -> {summary[key]:>9}")
+
+    if args.regenerate or args.update_baseline:
+        golden['baseline'] = {'ndcg': summary['ndcg'], 'recall': summary['recall']}
+        with open(args.golden, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"Baseline saved to {args.golden}")
+        return 0
+
+    baseline = golden.get('baseline')
+    if baseline:
+        failed = [key for key in ('ndcg', 'recall') if summary[key] < baseline[key] - TOLERANCE]
+        if failed:
+            print(f"REGRESSION: {', '.join(failed)} below baseline {baseline}")
+            return 1
+        print(f"OK: at or above baseline {baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
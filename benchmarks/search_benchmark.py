@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Search latency benchmark over synthetic directories.
+
+For each corpus size a throwaway database and semantic index are built
+under --workdir (and reused on later runs). Each engine then replays the
+same query mix in its own process, so peak RSS is per engine:
+
+    calculate_score  search_engine.calculate_score over every shop
+    vectorized       vector_scorer.VectorizedScorer.rank
+    semantic         SemanticSearch.search
+    search_shops     ExtendedSQLAlchemy.search_shops (the full /api/search path)
+
+Results (p50/p95/p99 latency, QPS, peak RSS) are written as JSON; pass a
+previous results file as --baseline to print the change per engine:
+
+    python benchmarks/search_benchmark.py --sizes 1000,10000,100000
+    python benchmarks/search_benchmark.py --baseline benchmarks/results/abc1234.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+for path in (BASE_DIR, os.path.join(BASE_DIR, 'python'), BENCH_DIR):
+    if path not in sys.path:
+        sys.path.append(path)
+
+ENGINES = ['calculate_score', 'vectorized', 'semantic', 'search_shops']
+DEFAULT_SIZES = [1000, 10000, 100000]
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def corpus_env(corpus_dir):
+    """Environment pointing config at a prepared corpus"""
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(corpus_dir, 'shop_details.db')}"
+    env['MODELS_DIR'] = os.path.join(corpus_dir, 'models')
+    env.pop('READ_REPLICA_URLS', None)
+    return env
+
+
+def prepare_corpus(corpus_dir, size, seed):
+    """Build the database and semantic index for one corpus (in a child process)"""
+    if os.path.exists(os.path.join(corpus_dir, 'ready')):
+        return
+    os.makedirs(corpus_dir, exist_ok=True)
+    subprocess.run([sys.executable, __file__, '--prepare', corpus_dir, '--size', str(size), '--seed', str(seed)],
+                   env=corpus_env(corpus_dir), check=True)
+
+
+def _prepare(corpus_dir, size, seed):
+    import contextlib
+    import io
+
+    from synthetic_corpus import generate_corpus
+    from database import make_engine
+    import migrations
+
+    data = generate_corpus(size, seed)
+    with open(os.path.join(corpus_dir, 'shops.json'), 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrations.migrate(make_engine())
+        import config
+        config.WARMUP_ON_START = False
+        from app import app, db
+        from semantic_search import SemanticSearch
+        with app.app_context():
+            db.import_data(data)
+        SemanticSearch().build_index()
+
+    open(os.path.join(corpus_dir, 'ready'), 'w').close()
+    print(f"Prepared {size} shops in {corpus_dir}")
+
+
+def _engine(name, corpus_dir):
+    """Set up an engine; returns a callable taking one query"""
+    from search_engine import normalize_text, tokenize, calculate_score
+
+    if name == 'calculate_score':
+        with open(os.path.join(corpus_dir, 'shops.json'), 'r', encoding='utf-8') as f:
+            shops = [{'name': s['name'], 'products': s['products'], 'tags': []}
+                     for s in json.load(f)['shops']]
+
+        def run(query):
+            normalized_query, query_tokens = normalize_text(query), tokenize(query)
+            return [i for i, shop in enumerate(shops) if calculate_score(shop, query_tokens, normalized_query) > 0]
+        return run
+
+    if name == 'vectorized':
+        from sqlalchemy.orm import Session
+        from database import make_engine, query_search_corpus
+        from vector_scorer import VectorizedScorer
+        with Session(make_engine()) as session:
+            scorer = VectorizedScorer(query_search_corpus(session))
+
+        def run(query):
+            return scorer.rank(tokenize(query), normalize_text(query), {})
+        return run
+
+    if name == 'semantic':
+        from semantic_search import get_semantic_search
+        index = get_semantic_search()
+        return index.search
+
+    if name == 'search_shops':
+        import config
+        config.WARMUP_ON_START = False
+        from app import app, db
+        context = app.app_context()
+        context.push()
+
+        def run(query):
+            try:
+                return db.search_shops(query)
+            finally:
+                db.session.remove()
+        return run
+
+    raise ValueError(f"Unknown engine '{name}'")
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _run_engine(name, corpus_dir, queries, time_budget):
+    """Child process: replay queries against one engine and print a JSON summary"""
+    start = time.perf_counter()
+    run = _engine(name, corpus_dir)
+    run(queries[0])  # first-call costs (index load, pool start) count as setup
+    setup_seconds = time.perf_counter() - start
+
+    latencies = []
+    started = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        run(query)
+        latencies.append(time.perf_counter() - query_start)
+        if time.perf_counter() - started > time_budget:
+            break
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(json.dumps({
+        'engine': name,
+        'queries': len(latencies),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 3),
+        'qps': round(len(latencies) / elapsed, 2),
+        'setup_s': round(setup_seconds, 3),
+        # ru_maxrss is KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run_engine(name, corpus_dir, queries_path, time_budget):
+    result = subprocess.run(
+        [sys.executable, __file__, '--engine', name, '--corpus', corpus_dir,
+         '--queries-file', queries_path, '--time-budget', str(time_budget)],
+        env=corpus_env(corpus_dir), check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['size'], r['engine']): r for r in json.load(f)['results']}
+    print(f"\nChange against {baseline_path}:")
+    for r in results:
+        old = baseline.get((r['size'], r['engine']))
+        if old is None:
+            continue
+        p95 = (r['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0
+        qps = (r['qps'] / old['qps'] - 1) * 100 if old['qps'] else 0
+        print(f"  {r['size']:>7} {r['engine']:<16} p95 {p95:+6.1f}%  qps {qps:+6.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search engines on synthetic corpora.")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma separated corpus sizes (default: 1000,10000,100000)")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="comma separated engines")
+    parser.add_argument('--queries', type=int, default=200, help="queries in the replayed mix")
+    parser.add_argument('--time-budget', type=float, default=60.0,
+                        help="seconds per engine and size; stops replaying early after it")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'shop_search_bench'),
+                        help="where prepared corpora are kept between runs")
+    parser.add_argument('-o', '--output', help="results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against")
+    # Child process entry points
+    parser.add_argument('--prepare', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--engine', help=argparse.SUPPRESS)
+    parser.add_argument('--corpus', help=argparse.SUPPRESS)
+    parser.add_argument('--queries-file', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.prepare:
+        return _prepare(args.prepare, args.size, args.seed)
+    if args.engine:
+        with open(args.queries_file, 'r', encoding='utf-8') as f:
+            queries = json.load(f)
+        return _run_engine(args.engine, args.corpus, queries, args.time_budget)
+
+    from synthetic_corpus import generate_queries
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    engines = [e for e in args.engines.split(',') if e]
+    os.makedirs(args.workdir, exist_ok=True)
+
+    queries_path = os.path.join(args.workdir, f'queries-{args.seed}-{args.queries}.json')
+    with open(queries_path, 'w', encoding='utf-8') as f:
+        json.dump(generate_queries(args.queries, args.seed), f, ensure_ascii=False)
+
+    results = []
+    print(f"{'size':>7} {'engine':<16} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'qps':>8} {'rss MB':>7}")
+    for size in sizes:
+        corpus_dir = os.path.join(args.workdir, f'corpus-{size}-{args.seed}')
+        prepare_corpus(corpus_dir, size, args.seed)
+        for engine in engines:
+            result = dict(size=size, **run_engine(engine, corpus_dir, queries_path, args.time_budget))
+            results.append(result)
+            print(f"{size:>7} {engine:<16} {result['queries']:>7} {result['p50_ms']:>9.2f} "
+                  f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['qps']:>8.1f} "
+                  f"{result['peak_rss_mb']:>7.1f}")
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'results': results,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        print_comparison(results, args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Synthetic shop directories and query mixes for the search benchmarks.
+
+Shops are assembled from the bundled shops_data.json (name words, product
+phrases, addresses, categories) and from search_engine.DOMAIN_MAP, so they
+normalize and tokenize like real listings. About a fifth are listed in
+English. Output uses the shops_data.json format:
+
+    python benchmarks/synthetic_corpus.py 10000 -o /tmp/shops_10k.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON_DIR = os.path.join(BASE_DIR, 'python')
+if PYTHON_DIR not in sys.path:
+    sys.path.append(PYTHON_DIR)
+
+from search_engine import DOMAIN_MAP
+
+DEFAULT_SOURCE = os.path.join(BASE_DIR, 'shops_data.json')
+BENGALI_DIGITS = '০১২৩৪৫৬৭৮৯'
+
+ENGLISH_SUFFIXES = ['Traders', 'Enterprise', 'Engineering Works', 'Machinery', 'Store', 'Corporation']
+
+
+def _split_words(text):
+    return [w for w in re.split(r'[\s,;.]+', text or '') if w]
+
+
+def load_vocabulary(json_path=DEFAULT_SOURCE):
+    """Word and phrase pools taken from a shops_data.json file and DOMAIN_MAP"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    shops = data['shops']
+    phrases = sorted({p.strip() for s in shops for p in (s['products'] or '').split(',') if p.strip()})
+    return {
+        'categories': data['categories'],
+        'name_words': sorted({w for s in shops for w in _split_words(s['name'])}),
+        'product_phrases': phrases,
+        'product_words': sorted({w for p in phrases for w in _split_words(p)}),
+        'addresses': sorted({s['address'] for s in shops if s['address']}),
+        'proprietors': sorted({s['proprietor'] for s in shops if s['proprietor']}),
+        'english_terms': sorted(DOMAIN_MAP),
+        'bengali_terms': sorted({v.strip() for values in DOMAIN_MAP.values()
+                                 for v in (values if isinstance(values, list) else [values]) if v.strip()}),
+    }
+
+
+def _bengali_number(number, width=0):
+    return ''.join(BENGALI_DIGITS[int(d)] for d in str(number).zfill(width))
+
+
+def _mobile(rng):
+    return f"{_bengali_number(rng.choice([13, 15, 17, 18, 19]), 3)}{_bengali_number(rng.randint(10, 99))}-" \
+           f"{_bengali_number(rng.randint(0, 999999), 6)}"
+
+
+def _shop(rng, vocab, serial):
+    category = rng.choice(vocab['categories'])
+    english = rng.random() < 0.2
+
+    if english:
+        terms = rng.sample(vocab['english_terms'], rng.randint(2, 6))
+        name = f"{rng.choice(vocab['english_terms']).title()} {rng.choice(ENGLISH_SUFFIXES)}"
+        products = ', '.join(terms)
+    else:
+        name = ' '.join(rng.sample(vocab['name_words'], rng.randint(2, 3)))
+        phrases = rng.sample(vocab['product_phrases'], rng.randint(1, 6))
+        # Listings often mix in a DOMAIN_MAP spelling variant
+        if rng.random() < 0.5:
+            phrases.append(rng.choice(vocab['bengali_terms']))
+        products = ', '.join(phrases)
+
+    return {
+        'serial_no': _bengali_number(serial),
+        'name': name,
+        'proprietor': rng.choice(vocab['proprietors']) if rng.random() < 0.5 else '',
+        'address': rng.choice(vocab['addresses']),
+        'mobile': ' '.join(_mobile(rng) for _ in range(rng.randint(1, 2))),
+        'transaction_status': '',
+        'whatsapp': '',
+        'email_web': '',
+        'products': products,
+        'category_id': category['id'],
+        'category_name': category['name'],
+    }
+
+
+def generate_corpus(size, seed=0, json_path=DEFAULT_SOURCE):
+    """A shops_data.json-style dict with `size` synthetic shops"""
+    rng = random.Random(seed)
+    vocab = load_vocabulary(json_path)
+    return {
+        'categories': vocab['categories'],
+        'shops': [_shop(rng, vocab, serial) for serial in range(1, size + 1)],
+    }
+
+
+def generate_queries(count, seed=0, json_path=DEFAULT_SOURCE):
+    """A search query mix: product words, DOMAIN_MAP terms in both scripts, phrases, prefixes, names"""
+    rng = random.Random(seed)
+    vocab = load_vocabulary(json_path)
+
+    def prefix():
+        word = rng.choice([w for w in vocab['product_words'] if len(w) > 3] or vocab['product_words'])
+        return word[:rng.randint(3, len(word))]
+
+    mix = [
+        (0.30, lambda: rng.choice(vocab['product_words'])),
+        (0.15, lambda: rng.choice(vocab['english_terms'])),
+        (0.15, lambda: rng.choice(vocab['bengali_terms'])),
+        (0.15, lambda: ' '.join(rng.sample(vocab['product_words'], 2))),
+        (0.10, prefix),
+        (0.10, lambda: ' '.join(rng.sample(vocab['name_words'], rng.randint(1, 2)))),
+        (0.05, lambda: f"{rng.choice(vocab['english_terms'])} {rng.choice(vocab['english_terms'])}"),
+    ]
+    weights = [weight for weight, _ in mix]
+    makers = [maker for _, maker in mix]
+    return [rng.choices(makers, weights)[0]() for _ in range(count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic shop directory.")
+    parser.add_argument('size', type=int, help="number of shops")
+    parser.add_argument('-o', '--output', required=True, help="output JSON path")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = generate_corpus(args.size, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    print(f"Wrote {len(data['shops'])} shops to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,529 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_
+from flask_sqlalchemy.session import Session
+from sqlalchemy import or_, event, create_engine
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, selectinload
+import contextlib
+import contextvars
 import datetime
+import functools
+import inspect
+import itertools
+import sqlite3
+
+import config
+from metrics import DB_ROUTING, span
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Apply config.SQLITE_PRAGMAS to a new DB-API connection"""
+    cursor = dbapi_connection.cursor()
+    for name, value in config.SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def tune_engine(engine):
+    """Hook the SQLite tuning profile onto an engine's new connections"""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', apply_sqlite_pragmas)
+    return engine
+
+
+def make_engine(uri=None, **options):
+    """Standalone engine with the app's pool settings and tuning profile"""
+    uri = uri or config.SQLALCHEMY_DATABASE_URI
+    if ':memory:' not in uri:
+        options = {**config.SQLALCHEMY_ENGINE_OPTIONS, **options}
+    return tune_engine(create_engine(uri, **options))
+
+
+def sqlite_connect(path):
+    """Raw sqlite3 connection with the same tuning profile as the engines"""
+    conn = sqlite3.connect(path, timeout=config.SQLITE_PRAGMAS.get('busy_timeout', 5000) / 1000)
+    apply_sqlite_pragmas(conn)
+    return conn
+
+
+# ==================== SHARED QUERIES ====================
+# Session-level query logic used by ExtendedSQLAlchemy (Flask's scoped
+# session) and by the async API (a sync session inside AsyncSession.run_sync).
+
+def query_shops_page(session, limit, offset):
+    shops = session.query(Shop).order_by(Shop.id).limit(limit).offset(offset).all()
+    return [s.to_dict() for s in shops]
+
+
+def query_shops_count(session):
+    return session.query(Shop).count()
+
+
+def query_all_tags(session):
+    tags = session.query(Tag).order_by(Tag.name).all()
+    return [t.to_dict() for t in tags]
+
+
+def prepare_search(query):
+    """Normalize a query and score it against the semantic index.
+
+    Returns (normalized_query, query_tokens, semantic_scores, fuzzy), or
+    None if there is nothing to search for. fuzzy maps query tokens missing
+    from the index vocabulary to their spelling corrections (see
+    python/spelling.py). CPU-bound; touches no database session.
+    """
+    return prepare_search_batch([query])[0]
+
+
+def prepare_search_batch(queries):
+    """prepare_search for many queries with a single semantic index pass"""
+    from search_engine import normalize_text, tokenize
+    from semantic_search import get_semantic_search
+    from spelling import get_spelling_index
+
+    semantic = get_semantic_search()
+    spelling = get_spelling_index(semantic.terms) if semantic.terms is not None else None
+
+    prepared = [None] * len(queries)
+    pending = []
+    semantic_queries = []
+    for position, query in enumerate(queries):
+        if not query:
+            continue
+        normalized_query = normalize_text(query)
+        if normalized_query:
+            query_tokens = tokenize(query)
+            with span('spelling'):
+                fuzzy = spelling.corrections(query_tokens) if spelling is not None else {}
+            prepared[position] = (normalized_query, query_tokens, fuzzy)
+            pending.append(position)
+            # Each misspelled token is replaced by its corrections
+            semantic_tokens = (query_tokens - fuzzy.keys()).union(*fuzzy.values())
+            semantic_queries.append(' '.join(sorted(semantic_tokens)))
+
+    semantic_results = semantic.search_batch(semantic_queries) if pending else []
+    for position, results in zip(pending, semantic_results):
+        normalized_query, query_tokens, fuzzy = prepared[position]
+        semantic_scores = {r['shop_id']: r['score'] * 100 for r in results} # Scale up 0-1 to 0-100 logic
+        prepared[position] = (normalized_query, query_tokens, semantic_scores, fuzzy)
+    return prepared
+
+
+def query_search_candidates(session, query_tokens, normalized_query, semantic_scores, fuzzy=None):
+    """Shops that can score above zero, filtered in the database.
+
+    Every lexical match needs a query token (or the whole query) to occur
+    in Shop.search_text, so a substring filter drops nothing. On PostgreSQL
+    it is served by the pg_trgm index on search_text.
+    """
+    return query_search_candidates_batch(session, [(normalized_query, query_tokens, semantic_scores, fuzzy or {})])
+
+
+def query_search_candidates_batch(session, prepared):
+    """Union of the candidates of several prepared queries, in one query"""
+    terms = set()
+    semantic_ids = set()
+    for normalized_query, query_tokens, semantic_scores, fuzzy in prepared:
+        terms.update(query_tokens)
+        terms.add(normalized_query)
+        for corrections in fuzzy.values():
+            terms.update(corrections)
+        # Semantic-only hits need sem_score > 5 to be kept (see rank_search_candidates)
+        semantic_ids.update(shop_id for shop_id, sem_score in semantic_scores.items() if sem_score > 5)
+
+    conditions = [Shop.search_text.contains(term, autoescape=True) for term in sorted(terms)]
+    if semantic_ids:
+        conditions.append(Shop.id.in_(sorted(semantic_ids)))
+    return session.query(Shop).filter(or_(*conditions)).order_by(Shop.id).all()
+
+
+def rank_search_candidates(shops, query_tokens, normalized_query, semantic_scores, fuzzy=None):
+    """Score candidates lexically, fuse in semantic scores, best first.
+
+    CPU-bound; only reads already loaded columns, so it can run off-thread.
+    """
+    from search_engine import normalize_text
+
+    rows = [(shop, normalize_text(shop.name), shop.search_text or '') for shop in shops]
+    return _rank_rows(rows, query_tokens, normalized_query, semantic_scores, fuzzy)
+
+
+def rank_search_candidates_batch(shops, prepared):
+    """rank_search_candidates for several prepared queries over one shared candidate list"""
+    from search_engine import normalize_text
+
+    rows = [(shop, normalize_text(shop.name), shop.search_text or '') for shop in shops]
+    return [_rank_rows(rows, query_tokens, normalized_query, semantic_scores, fuzzy)
+            for normalized_query, query_tokens, semantic_scores, fuzzy in prepared]
+
+
+def _rank_rows(rows, query_tokens, normalized_query, semantic_scores, fuzzy=None):
+    from search_engine import score_search_text, fuse_scores
+
+    scored_shops = []
+    for shop, shop_name, search_text in rows:
+        score = score_search_text(shop_name, search_text, query_tokens, normalized_query, fuzzy)
+        score = fuse_scores(score, semantic_scores.get(shop.id, 0))
+        if score > 0:
+            scored_shops.append((score, shop))
+    
+    scored_shops.sort(key=lambda x: x[0], reverse=True)
+    return [item[1] for item in scored_shops]
+
+
+def query_search_corpus(session):
+    """(shop_id, normalized name, search_text) for every shop, in id order"""
+    from search_engine import normalize_text
+    rows = session.query(Shop.id, Shop.name, Shop.search_text).order_by(Shop.id).all()
+    return [(shop_id, normalize_text(name), search_text or '') for shop_id, name, search_text in rows]
+
+
+def query_generations(session, scopes):
+    """Current data generation of each scope (0 if never written)"""
+    rows = session.query(DataGeneration).filter(DataGeneration.scope.in_(scopes)).all()
+    found = {r.scope: r.value for r in rows}
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+class CorpusRankers:
+    """Picks the whole-corpus ranker for a search, or None to filter candidates in SQL.
+
+    'vectorized' (config.SEARCH_SCORER) scores all shops with array
+    operations; otherwise a process pool takes over once the corpus reaches
+    config.PARALLEL_SCORING_MIN_SHOPS. Shared by search_shops and the async
+    API so both rank the same way; corpora are cached per 'shops' generation.
+    load_rows does the database work and build the CPU-bound part, so the
+    async API can run them on different threads.
+    """
+
+    def __init__(self):
+        self._vector_scorer = None  # (generation, VectorizedScorer)
+        self._corpus_size = None    # (generation, shop count)
+
+    @staticmethod
+    def enabled():
+        return config.SEARCH_SCORER == 'vectorized' or bool(config.PARALLEL_SCORING_MIN_SHOPS)
+
+    def get(self, session, generation):
+        return self.build(generation, self.load_rows(session, generation))
+
+    def load_rows(self, session, generation):
+        """Database half of get(): corpus rows the ranker needs rebuilding from, or None"""
+        from parallel_scoring import get_sharded_scorer
+
+        if config.SEARCH_SCORER == 'vectorized':
+            if self._vector_scorer is None or self._vector_scorer[0] != generation:
+                return query_search_corpus(session)
+            return None
+
+        if not config.PARALLEL_SCORING_MIN_SHOPS:
+            return None
+        if self._corpus_size is None or self._corpus_size[0] != generation:
+            self._corpus_size = (generation, query_shops_count(session))
+        if self._corpus_size[1] < config.PARALLEL_SCORING_MIN_SHOPS:
+            return None
+        if get_sharded_scorer(config.PARALLEL_SCORING_WORKERS).is_current(generation):
+            return None
+        return query_search_corpus(session)
+
+    def build(self, generation, rows=None):
+        """CPU half of get(): the ranker, built (or published) from rows when load_rows returned some"""
+        from parallel_scoring import get_sharded_scorer
+
+        if config.SEARCH_SCORER == 'vectorized':
+            if rows is not None:
+                from vector_scorer import VectorizedScorer
+                self._vector_scorer = (generation, VectorizedScorer(rows))
+            return self._vector_scorer[1]
+
+        if not config.PARALLEL_SCORING_MIN_SHOPS or self._corpus_size[1] < config.PARALLEL_SCORING_MIN_SHOPS:
+            return None
+        scorer = get_sharded_scorer(config.PARALLEL_SCORING_WORKERS)
+        if rows is not None:
+            scorer.publish(generation, rows)
+        return scorer
+
+
+def query_suggest_shops(session, shop_ids=None):
+    """(shop_id, name, products) for every shop, or for shop_ids, for the suggest index"""
+    query = session.query(Shop.id, Shop.name, Shop.products)
+    if shop_ids is not None:
+        query = query.filter(Shop.id.in_(shop_ids))
+    return query.order_by(Shop.id).all()
+
+
+def query_tag_counts(session):
+    """(name, name_bn, shop_count) for every tag"""
+    return (session.query(Tag.name, Tag.name_bn, db.func.count(ShopTag.id))
+            .outerjoin(ShopTag, ShopTag.tag_id == Tag.id)
+            .group_by(Tag.id).order_by(Tag.id).all())
+
+
+def query_last_change_seq(session):
+    """Newest change log seq (0 for an empty log)"""
+    return session.query(db.func.max(ChangeLog.seq)).scalar() or 0
+
+
+def query_change_rows(session, since, limit):
+    """Raw (seq, entity, entity_id, op) change log rows after seq `since`, oldest first"""
+    return (session.query(ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+            .filter(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit).all())
+
+
+def iter_shop_export(session, updated_since=None, batch_size=500):
+    """Stream every shop, or those updated after updated_since, as to_dict() rows.
+
+    Rows are fetched batch_size at a time with their category and tags
+    eager-loaded, so memory stays flat however large the directory is.
+    """
+    query = session.query(Shop).options(
+        joinedload(Shop.category),
+        selectinload(Shop.shop_tags).joinedload(ShopTag.tag),
+    )
+    if updated_since is None:
+        query = query.order_by(Shop.id)
+    else:
+        # Oldest change first, so a sync can resume from the last updated_at it saw
+        query = query.filter(Shop.updated_at > updated_since).order_by(Shop.updated_at, Shop.id)
+
+    for shop in query.yield_per(batch_size):
+        tags = [st.tag.to_dict() for st in sorted(shop.shop_tags, key=lambda st: st.id) if st.tag]
+        yield shop.to_dict(tags=tags)
+
+
+def query_changes(session, since, limit=1000):
+    """Compacted change feed after seq `since`.
+
+    Returns (changes, last_seq, has_more); pass last_seq back as `since` for
+    the next page. Several changes to one record collapse into
+    the latest; upserts carry the record's current to_dict(), deletes are
+    bare tombstones. A 'reset' means the whole directory was replaced.
+    Seqs become visible in commit order (see _log_change), so paging with
+    `since` never skips a change that commits late.
+    """
+    rows = session.query(ChangeLog).filter(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], since, False
+
+    latest = {}
+    for row in rows:
+        if row.op == 'reset':
+            # Everything before a reset is superseded by it
+            latest.clear()
+        latest.pop((row.entity, row.entity_id), None)
+        latest[(row.entity, row.entity_id)] = row
+
+    def ids_of(entity):
+        return [entity_id for (e, entity_id), row in latest.items() if e == entity and row.op == 'upsert']
+
+    records = {
+        'shop': {s.id: s for s in query_shops_by_ids(session, ids_of('shop'))},
+        'tag': {t.id: t for t in session.query(Tag).filter(Tag.id.in_(ids_of('tag')))},
+        'category': {c.id: c for c in session.query(Category).filter(Category.id.in_(ids_of('category')))},
+    }
+
+    changes = []
+    for (entity, entity_id), row in latest.items():
+        change = row.to_dict()
+        if row.op == 'upsert':
+            record = records[entity].get(entity_id)
+            if record is None:
+                # Deleted after this window; its tombstone comes in a later page
+                change['op'] = 'delete'
+            else:
+                change['data'] = record.to_dict()
+        changes.append(change)
+    return changes, rows[-1].seq, has_more
+
+
+def query_shops_by_ids(session, shop_ids, chunk_size=500):
+    """Shops for the given ids, in the given order"""
+    shops = {}
+    for start in range(0, len(shop_ids), chunk_size):
+        chunk = shop_ids[start:start + chunk_size]
+        shops.update((s.id, s) for s in session.query(Shop).filter(Shop.id.in_(chunk)))
+    return [shops[shop_id] for shop_id in shop_ids if shop_id in shops]
+
+
+# Set while a read_only method runs; RoutingSession may then use a replica
+_read_only = contextvars.ContextVar('db_read_only', default=False)
+
+# Set while a generation-keyed cache is filled; overrides read_only
+_pin_primary = contextvars.ContextVar('db_pin_primary', default=False)
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE (generation bumps, see _commit)
+UPSERT_INSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+# PostgreSQL advisory lock serializing change_log writers (see _log_change)
+CHANGE_LOG_LOCK_KEY = 0x5348_4F50
+
+
+def read_only(method):
+    """Mark an ExtendedSQLAlchemy method as safe to serve from a read replica"""
+    if inspect.isgeneratorfunction(method):
+        # Only flag the generator's own steps, not the caller between them
+        @functools.wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            generator = method(*args, **kwargs)
+            while True:
+                token = _read_only.set(True)
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    _read_only.reset(token)
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+    return wrapper
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Send every query in the block (or decorated function) to the primary, read_only ones included.
+
+    Caches keyed by data generations must be filled from the primary: the
+    generations are read there, and a lagging replica would store old rows
+    under the new generation until the next write.
+    """
+    token = _pin_primary.set(True)
+    try:
+        yield
+    finally:
+        _pin_primary.reset(token)
+
+
+class RoutingSession(Session):
+    """Session that sends read_only queries to a replica bind.
+
+    Falls back to the primary while flushing, and for the rest of the
+    session (one request) once it has written, so reads see their own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _read_only.get() and not _pin_primary.get()
+                and not self._flushing and not self.info.get('wrote')):
+            replica = self._db.pick_replica()
+            if replica is not None:
+                DB_ROUTING.inc('replica')
+                return replica
+        DB_ROUTING.inc('primary')
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_session_wrote(session, flush_context):
+    session.info['wrote'] = True
+
 
 class ExtendedSQLAlchemy(SQLAlchemy):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('session_options', {}).setdefault('class_', RoutingSession)
+        super().__init__(*args, **kwargs)
+        self._change_listeners = []
+        self._categories_cache = None
+        self._rankers = CorpusRankers()
+        self._replica_cycle = None
+
+    @property
+    def routing_counts(self):
+        """Bind decisions per target ('primary' / 'replica') in this process"""
+        return DB_ROUTING.snapshot()
+
+    def pick_replica(self):
+        """Next read replica engine (round-robin), or None without replicas"""
+        if self._replica_cycle is None:
+            replicas = [engine for key, engine in sorted(self.engines.items(), key=lambda kv: str(kv[0]))
+                        if key and key.startswith(REPLICA_BIND_PREFIX)]
+            self._replica_cycle = itertools.cycle(replicas) if replicas else iter(())
+        return next(self._replica_cycle, None)
+
+    def _make_engine(self, bind_key, options, app):
+        return tune_engine(super()._make_engine(bind_key, options, app))
+
+    def add_change_listener(self, listener):
+        """Register a callable notified with the touched scopes after each write"""
+        self._change_listeners.append(listener)
+
+    def get_generations(self, scopes):
+        """Current data generation of each scope (0 if never written).
+
+        Always read from the primary, also inside read_only methods: a lagging
+        replica would keep serving pages cached under an already invalidated
+        generation.
+        """
+        with primary_reads():
+            return query_generations(self.session, scopes)
+
+    def _commit(self, *scopes):
+        """Commit the session, bumping the data generation of every touched scope"""
+        scopes = set(scopes)
+        # Sorted, so concurrent writers lock generation rows in the same order
+        for scope in sorted(scopes):
+            self._bump_generation(scope)
+        self.session.info['wrote'] = True
+        self.session.commit()
+
+        for listener in self._change_listeners:
+            listener(scopes)
+
+    def _bump_generation(self, scope):
+        dialect = self.engine.dialect.name
+        if dialect in UPSERT_INSERTS:
+            # One atomic upsert: two first writes to a scope cannot both insert
+            # and fail the second (legitimate) write on the primary key
+            insert = UPSERT_INSERTS[dialect](DataGeneration).values(scope=scope, value=1)
+            self.session.execute(insert.on_conflict_do_update(
+                index_elements=[DataGeneration.scope], set_={'value': DataGeneration.value + 1}))
+            return
+        updated = DataGeneration.query.filter_by(scope=scope).update(
+            {DataGeneration.value: DataGeneration.value + 1})
+        if not updated:
+            self.session.add(DataGeneration(scope=scope, value=1))
+
+    def _log_change(self, entity, entity_id, op='upsert'):
+        """Record a change for /api/changes; committed with the write it describes"""
+        if self.engine.dialect.name == 'postgresql':
+            # seq comes from a sequence at insert time. Holding this lock until
+            # commit makes writers take seqs in commit order, so a poller never
+            # sees seq N+1 before seq N has committed. (SQLite serializes writers.)
+            self.session.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {'key': CHANGE_LOG_LOCK_KEY})
+        self.session.add(ChangeLog(entity=entity, entity_id=entity_id, op=op))
+
+    def _refresh_shop_tags(self, shop):
+        """Reload a shop's tag links after a flush and rebuild its search text"""
+        self.session.expire(shop, ['shop_tags'])
+        shop.refresh_search_text()
+        # Tags are part of the shop's exported record
+        shop.updated_at = datetime.datetime.now()
+
+    @staticmethod
+    def _shop_scopes(shop):
+        scopes = ['shops', f'shop:{shop.id}']
+        if shop.category_id is not None:
+            scopes.append(f'category:{shop.category_id}')
+        return scopes
+
     def get_all_categories(self):
-        cats = Category.query.order_by(Category.id).all()
-        return [c.to_dict() for c in cats]
+        # Rendered on every page via the context processor; only rebuilt after a category write
+        generation = self.get_generations(['categories'])['categories']
+        if self._categories_cache is None or self._categories_cache[0] != generation:
+            with primary_reads():
+                cats = Category.query.order_by(Category.id).all()
+            self._categories_cache = (generation, [c.to_dict() for c in cats])
+        return self._categories_cache[1]
 
     def add_category(self, name, name_english=''):
         existing = Category.query.filter_by(name=name).first()
@@ -13,76 +531,104 @@ class ExtendedSQLAlchemy(SQLAlchemy):
             return existing.id
         new_cat = Category(name=name, name_english=name_english)
         self.session.add(new_cat)
-        self.session.commit()
+        self.session.flush()
+        self._log_change('category', new_cat.id)
+        self._commit('categories')
         return new_cat.id
 
+    @read_only
     def get_all_shops(self, limit=100000, offset=0):
-        shops = Shop.query.order_by(Shop.id).limit(limit).offset(offset).all()
-        return [s.to_dict() for s in shops]
+        return query_shops_page(self.session, limit, offset)
 
+    @read_only
+    def export_shops(self, updated_since=None):
+        yield from iter_shop_export(self.session, updated_since)
+
+    @read_only
+    def get_changes(self, since=0, limit=1000):
+        return query_changes(self.session, since, limit)
+
+    @read_only
     def get_shops_count(self):
-        return Shop.query.count()
+        return query_shops_count(self.session)
 
+    @read_only
     def get_shop_by_id(self, shop_id):
         shop = Shop.query.get(shop_id)
         return shop.to_dict() if shop else None
 
+    @read_only
     def get_shops_by_category(self, category_id):
         shops = Shop.query.filter_by(category_id=category_id).order_by(Shop.id).all()
         return [s.to_dict() for s in shops]
 
-    def search_shops(self, query):
-        from search_engine import normalize_text, tokenize, calculate_score
-        from sqlalchemy.orm import joinedload
-        from semantic_search import SemanticSearch
-        
-        if not query:
-            return []
-            
-        # Pre-process query
-        normalized_query = normalize_text(query)
-        query_tokens = tokenize(query)
-        
-        if not normalized_query:
+    @primary_reads()
+    def _corpus_ranker(self):
+        """CorpusRankers.get for search_shops; the generation-keyed corpus is loaded from the primary"""
+        if not self._rankers.enabled():
+            return None
+        generation = self.get_generations(['shops'])['shops']
+        return self._rankers.get(self.session, generation)
+
+    @read_only
+    def search_shops(self, query, limit=None):
+        """Ranked shop dicts for query; only the best `limit` when given"""
+        prepared = prepare_search(query)
+        if prepared is None:
             return []
-            
-        semantic_search = SemanticSearch()
-        semantic_results = semantic_search.search(query)
-        
-        semantic_scores = {r['shop_id']: r['score'] * 100 for r in semantic_results} # Scale up 0-1 to 0-100 logic
-            
-        # Fetch all shops with eager loaded tags to avoid N+1 query problem
-        shops = Shop.query.options(
-             joinedload(Shop.shop_tags).joinedload(ShopTag.tag)
-        ).all()
-        
-        scored_shops = []
-        for shop in shops:
-            tags_data = [{'name': st.tag.name, 'name_bn': st.tag.name_bn} for st in shop.shop_tags]
-            
-            search_data = {
-                'name': shop.name,
-                'products': shop.products,
-                'tags': tags_data
-            }
-            
-            score = calculate_score(search_data, query_tokens, normalized_query)
-            
-            sem_score = semantic_scores.get(shop.id, 0)
-            
-            if sem_score > 0:
-                if score > 0:
-                    score += sem_score + 20
-                else:
-                    if sem_score > 5:
-                        score = sem_score
-                        
-            if score > 0:
-                scored_shops.append((score, shop))
-        
-        scored_shops.sort(key=lambda x: x[0], reverse=True)
-        
-        return [item[1].to_dict() for item in scored_shops]
+        normalized_query, query_tokens, semantic_scores, fuzzy = prepared
+
+        with span('corpus_load'):
+            ranker = self._corpus_ranker()
+        if ranker is not None:
+            with span('lexical'):
+                shop_ids = ranker.rank(query_tokens, normalized_query, semantic_scores, limit=limit, fuzzy=fuzzy)
+            with span('db_fetch'):
+                ranked = query_shops_by_ids(self.session, shop_ids)
+        else:
+            with span('db_fetch'):
+                shops = query_search_candidates(self.session, query_tokens, normalized_query, semantic_scores, fuzzy)
+            with span('lexical'):
+                ranked = rank_search_candidates(shops, query_tokens, normalized_query, semantic_scores, fuzzy)
+            ranked = ranked[:limit]
+
+        with span('to_dict'):
+            return [shop.to_dict() for shop in ranked]
+
+    @read_only
+    def search_shops_batch(self, queries, limit=None):
+        """search_shops for each query, sharing the semantic pass and the corpus pass"""
+        prepared = prepare_search_batch(queries)
+        active = [p for p in prepared if p is not None]
+        if not active:
+            return [[] for _ in queries]
+
+        with span('corpus_load'):
+            ranker = self._corpus_ranker()
+        if ranker is not None:
+            with span('lexical'):
+                ranked_ids = [ranker.rank(query_tokens, normalized_query, semantic_scores, limit=limit, fuzzy=fuzzy)
+                              for normalized_query, query_tokens, semantic_scores, fuzzy in active]
+            all_ids = list(dict.fromkeys(itertools.chain.from_iterable(ranked_ids)))
+            with span('db_fetch'):
+                shops = {shop.id: shop for shop in query_shops_by_ids(self.session, all_ids)}
+            ranked = [[shops[i] for i in ids if i in shops] for ids in ranked_ids]
+        else:
+            with span('db_fetch'):
+                shops = query_search_candidates_batch(self.session, active)
+            with span('lexical'):
+                ranked = [shops[:limit] for shops in rank_search_candidates_batch(shops, active)]
+
+        # Serialize each shop once, however many queries it matches
+        dicts = {}
+        with span('to_dict'):
+            for shop in itertools.chain.from_iterable(ranked):
+                if shop.id not in dicts:
+                    dicts[shop.id] = shop.to_dict()
+
+        ranked = iter(ranked)
+        return [[dicts[shop.id] for shop in next(ranked)] if p is not None else []
+                for p in prepared]
 
     def add_shop(self, data):
         new_shop = Shop(
@@ -98,8 +644,11 @@ class ExtendedSQLAlchemy(SQLAlchemy):
             products=data.get('products'),
             visiting_card=data.get('visiting_card')
         )
+        new_shop.refresh_search_text()
         self.session.add(new_shop)
-        self.session.commit()
+        self.session.flush()
+        self._log_change('shop', new_shop.id)
+        self._commit(*self._shop_scopes(new_shop))
         return new_shop.id
 
     def update_shop(self, shop_id, data):
@@ -107,6 +656,7 @@ class ExtendedSQLAlchemy(SQLAlchemy):
         if not shop:
             return False
         
+        scopes = self._shop_scopes(shop)
         shop.category_id = data.get('category_id')
         shop.serial_no = data.get('serial_no')
         shop.name = data.get('name')
@@ -120,22 +670,32 @@ class ExtendedSQLAlchemy(SQLAlchemy):
         if 'visiting_card' in data:
             shop.visiting_card = data.get('visiting_card')
         shop.updated_at = datetime.datetime.now()
+        shop.refresh_search_text()
+        self._log_change('shop', shop.id)
         
-        self.session.commit()
+        self._commit(*scopes, *self._shop_scopes(shop))
         return True
 
     def delete_shop(self, shop_id):
         shop = Shop.query.get(shop_id)
         if shop:
+            scopes = self._shop_scopes(shop)
+            tag_ids = sorted({st.tag_id for st in shop.shop_tags})
             self.session.delete(shop)
-            self.session.commit()
+            self._log_change('shop', shop_id, 'delete')
+            for tag_id in tag_ids:
+                self._log_change('tag', tag_id)  # shop_count
+            if tag_ids:
+                scopes.append('tags')
+            self._commit(*scopes)
             return True
         return False
 
+    @read_only
     def get_all_tags(self):
-        tags = Tag.query.order_by(Tag.name).all()
-        return [t.to_dict() for t in tags]
+        return query_all_tags(self.session)
 
+    @read_only
     def get_tag_by_id(self, tag_id):
         tag = Tag.query.get(tag_id)
         return tag.to_dict() if tag else None
@@ -146,18 +706,29 @@ class ExtendedSQLAlchemy(SQLAlchemy):
             return existing.id
         new_tag = Tag(name=name, name_bn=name_bn)
         self.session.add(new_tag)
-        self.session.commit()
+        self.session.flush()
+        self._log_change('tag', new_tag.id)
+        self._commit('tags')
         return new_tag.id
 
     def delete_tag(self, tag_id):
         tag = Tag.query.get(tag_id)
         if tag:
-            ShopTag.query.filter_by(tag_id=tag_id).delete()
+            scopes = ['tags']
+            shops = [st.shop for st in tag.shop_tags if st.shop]
+            # Loaded ShopTag rows are removed by the delete-orphan cascade
             self.session.delete(tag)
-            self.session.commit()
+            self.session.flush()
+            self._log_change('tag', tag_id, 'delete')
+            for shop in shops:
+                self._refresh_shop_tags(shop)
+                self._log_change('shop', shop.id)
+                scopes.extend(self._shop_scopes(shop))
+            self._commit(*scopes)
             return True
         return False
 
+    @read_only
     def get_shop_tags(self, shop_id):
         shop = Shop.query.get(shop_id)
         if shop:
@@ -170,19 +741,39 @@ class ExtendedSQLAlchemy(SQLAlchemy):
             return existing.id
         new_shop_tag = ShopTag(shop_id=shop_id, tag_id=tag_id)
         self.session.add(new_shop_tag)
-        self.session.commit()
+        self.session.flush()
+        scopes = ['tags']
+        self._log_change('tag', tag_id)  # shop_count
+        shop = Shop.query.get(shop_id)
+        if shop:
+            self._refresh_shop_tags(shop)
+            self._log_change('shop', shop.id)
+            scopes.extend(self._shop_scopes(shop))
+        self._commit(*scopes)
         return new_shop_tag.id
 
     def remove_shop_tag(self, shop_id, tag_id):
         shop_tag = ShopTag.query.filter_by(shop_id=shop_id, tag_id=tag_id).first()
         if shop_tag:
+            scopes = ['tags']
+            shop = shop_tag.shop
             self.session.delete(shop_tag)
-            self.session.commit()
+            self.session.flush()
+            self._log_change('tag', tag_id)  # shop_count
+            if shop:
+                self._refresh_shop_tags(shop)
+                self._log_change('shop', shop.id)
+                scopes.extend(self._shop_scopes(shop))
+            self._commit(*scopes)
             return True
         return False
 
+    @read_only
     def search_shops_by_tag(self, tag_name):
-        tag = Tag.query.filter(Tag.name.ilike(f'%{tag_name}%')).first()
+        # Exact (case-insensitive) name via ix_tags_name_lower; substring match only as fallback
+        tag = Tag.query.filter(db.func.lower(Tag.name) == tag_name.lower()).first()
+        if not tag:
+            tag = Tag.query.filter(Tag.name.ilike(f'%{tag_name}%')).first()
         if not tag:
             return []
         shops = [st.shop for st in tag.shop_tags if st.shop]
@@ -192,14 +783,21 @@ class ExtendedSQLAlchemy(SQLAlchemy):
         import json
         with open(json_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
+        return self.import_data(data)
 
+    def import_data(self, data):
+        """Replace all categories and shops with data ({'categories': [...], 'shops': [...]})"""
         Shop.query.delete()
         Category.query.delete()
         
-        try:
-            self.session.execute(db.text("DELETE FROM sqlite_sequence WHERE name='shops' OR name='categories'"))
-        except Exception:
-            pass
+        dialect = self.engine.dialect.name
+        if dialect == 'sqlite':
+            try:
+                self.session.execute(db.text("DELETE FROM sqlite_sequence WHERE name='shops' OR name='categories'"))
+            except Exception:
+                pass
+        elif dialect == 'postgresql':
+            self.session.execute(db.text("SELECT setval(pg_get_serial_sequence('shops', 'id'), 1, false)"))
 
         for cat in data['categories']:
             new_cat = Category(
@@ -211,6 +809,11 @@ class ExtendedSQLAlchemy(SQLAlchemy):
         
         self.session.flush()
 
+        if dialect == 'postgresql':
+            # Categories were inserted with explicit ids; move the sequence past them
+            self.session.execute(db.text(
+                "SELECT setval(pg_get_serial_sequence('categories', 'id'), (SELECT MAX(id) FROM categories))"))
+
         # Insert shops
         for shop in data['shops']:
             new_shop = Shop(
@@ -225,9 +828,14 @@ class ExtendedSQLAlchemy(SQLAlchemy):
                 email_web=shop.get('email_web', ''),
                 products=shop.get('products', '')
             )
+            new_shop.refresh_search_text()
             self.session.add(new_shop)
         
-        self.session.commit()
+        # Ids are reassigned, so mirrors have to start over from a full export
+        self._log_change('directory', None, 'reset')
+
+        # Every page depends on 'categories' (sidebar), so this invalidates them all
+        self._commit('categories', 'shops', 'tags')
         return len(data['categories']), len(data['shops'])
 
 db = ExtendedSQLAlchemy()
@@ -235,7 +843,7 @@ db = ExtendedSQLAlchemy()
 class Category(db.Model):
     __tablename__ = 'categories'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(10000), nullable=False)
+    name = db.Column(db.String(10000), nullable=False, index=True)  # add_category lookup
     name_english = db.Column(db.String(10000))
     shops = db.relationship('Shop', backref='category', lazy=True)
 
@@ -249,7 +857,7 @@ class Category(db.Model):
 class Shop(db.Model):
     __tablename__ = 'shops'
     id = db.Column(db.Integer, primary_key=True)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), index=True)  # get_shops_by_category
     serial_no = db.Column(db.String(5000))
     name = db.Column(db.String(20000))
     proprietor = db.Column(db.String(10000))
@@ -261,13 +869,27 @@ class Shop(db.Model):
     products = db.Column(db.Text)
     visiting_card = db.Column(db.String(5000))
     created_at = db.Column(db.DateTime, default=datetime.datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now,
+                           index=True)  # export updated_since
+    # Normalized name + products + tags (search_engine.build_search_text), kept in sync on write
+    search_text = db.Column(db.Text)
     
     # Tag relationship (many-to-many via ShopTag)
     shop_tags = db.relationship('ShopTag', backref='shop', lazy=True, cascade='all, delete-orphan')
     tags = db.relationship('Tag', secondary='shop_tags', viewonly=True, lazy='dynamic')
 
-    def to_dict(self):
+    # Serial numbers are only unique within a category
+    __table_args__ = (db.Index('ix_shops_category_serial', 'category_id', 'serial_no'),)
+
+    def refresh_search_text(self):
+        from search_engine import build_search_text
+        tags = [{'name': st.tag.name, 'name_bn': st.tag.name_bn} for st in self.shop_tags if st.tag]
+        self.search_text = build_search_text(self.name, self.products, tags)
+
+    def to_dict(self, tags=None):
+        """tags: already serialized tags, to skip the per-shop tags query"""
+        if tags is None:
+            tags = [t.to_dict() for t in self.tags] if self.tags else []
         return {
             'id': self.id,
             'category_id': self.category_id,
@@ -285,7 +907,7 @@ class Shop(db.Model):
             'visiting_card': self.visiting_card,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'tags': [t.to_dict() for t in self.tags] if self.tags else []
+            'tags': tags
         }
 
 
@@ -300,6 +922,9 @@ class Tag(db.Model):
     # Relationship to shops via ShopTag
     shop_tags = db.relationship('ShopTag', backref='tag', lazy=True, cascade='all, delete-orphan')
 
+    # search_shops_by_tag exact lookup
+    __table_args__ = (db.Index('ix_tags_name_lower', db.func.lower(name)),)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -309,6 +934,32 @@ class Tag(db.Model):
         }
 
 
+class DataGeneration(db.Model):
+    """Write counter per cache scope ('shops', 'shop:<id>', 'category:<id>', ...)"""
+    __tablename__ = 'data_generations'
+    scope = db.Column(db.String(200), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChangeLog(db.Model):
+    """Append-only feed of writes for /api/changes ('upsert' / 'delete' tombstone / 'reset')"""
+    __tablename__ = 'change_log'
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # 'shop', 'tag', 'category' or 'directory'
+    entity_id = db.Column(db.Integer)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.datetime.now)
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'entity': self.entity,
+            'id': self.entity_id,
+            'op': self.op,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+
 class ShopTag(db.Model):
     """Many-to-many relationship between Shop and Tag"""
     __tablename__ = 'shop_tags'
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Ingest many ODT directory documents at once.
+
+Parses every document in a process pool, maps each document's categories
+onto one shared set of ids (matched by name), drops shops already listed
+by an earlier document and writes the merged result in the shops_data.json
+format, or imports it straight into the database:
+
+    python ingest.py regional/ extra/*.odt -o shops_data.json
+    python ingest.py regional/ --import-db
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from odt_parser import parse_odt, bengali_to_english_num, normalize_text
+
+
+def find_documents(sources):
+    """Expand directories and glob patterns into a sorted list of .odt paths"""
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            paths.update(glob.glob(os.path.join(source, '**', '*.odt'), recursive=True))
+        else:
+            paths.update(p for p in glob.glob(source) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def _parse_document(path):
+    """Worker task: (path, parsed data, seconds), with parse_odt's progress output suppressed"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = parse_odt(path)
+    return path, data, time.perf_counter() - start
+
+
+def _shop_key(shop):
+    """Identity of a shop across documents: name plus mobile digits (address without a mobile)"""
+    name = ' '.join(normalize_text(shop.get('name', '')).split())
+    mobile = re.sub(r'\D', '', bengali_to_english_num(shop.get('mobile', '')))
+    if mobile:
+        return name, mobile
+    return name, ' '.join(normalize_text(shop.get('address', '')).split())
+
+
+class Merger:
+    """Accumulates parsed documents into one category and shop list"""
+
+    def __init__(self):
+        self.categories = {}   # id -> category dict
+        self._ids_by_name = {}
+        self.shops = []
+        self._shop_keys = set()  # keys of shops from earlier documents
+        self.duplicates = 0
+        self.repeated = 0        # shops listed more than once within one document (all kept)
+
+    def _category_id(self, category):
+        """Shared id for a document's category: by name, keeping the document's id when it is free"""
+        name = ' '.join(normalize_text(category['name']).split())
+        shared_id = self._ids_by_name.get(name)
+        if shared_id is None:
+            shared_id = category['id']
+            if shared_id in self.categories:
+                shared_id = max(self.categories) + 1
+            self._ids_by_name[name] = shared_id
+            self.categories[shared_id] = {
+                'id': shared_id,
+                'name': name,
+                'name_english': category.get('name_english', ''),
+            }
+        return shared_id
+
+    def add(self, data):
+        """Merge one parse_odt result; returns (shops added, duplicates skipped, repeated within it).
+
+        Only shops already listed by an earlier document are skipped. A
+        document listing a shop under several categories keeps every listing,
+        as odt_parser does; those are counted as repeated.
+        """
+        id_map = {c['id']: self._category_id(c) for c in data['categories']}
+        added = skipped = 0
+        document_keys = set()
+        repeated = 0
+        for shop in data['shops']:
+            key = _shop_key(shop)
+            if key in self._shop_keys:
+                skipped += 1
+                continue
+            if key in document_keys:
+                repeated += 1
+            document_keys.add(key)
+
+            category_id = id_map.get(shop.get('category_id'))
+            shop = dict(shop, category_id=category_id,
+                        category_name=self.categories[category_id]['name'] if category_id else None)
+            self.shops.append(shop)
+            added += 1
+        self._shop_keys |= document_keys
+        self.duplicates += skipped
+        self.repeated += repeated
+        return added, skipped, repeated
+
+    def result(self):
+        return {
+            'categories': [self.categories[i] for i in sorted(self.categories)],
+            'shops': self.shops,
+        }
+
+
+def ingest(paths, workers=None):
+    """Parse and merge documents; prints one timing line per document"""
+    merger = Merger()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps input order, so the merge is deterministic
+        for path, data, seconds in pool.map(_parse_document, paths):
+            added, skipped, repeated = merger.add(data)
+            print(f"{path}: {len(data['shops'])} shops ({added} new, {skipped} duplicate, "
+                  f"{repeated} listed again within the document), "
+                  f"{len(data['categories'])} categories in {seconds:.2f}s")
+    return merger
+
+
+def main(argv=None):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Parse and merge ODT shop directories.")
+    parser.add_argument('sources', nargs='+', help="ODT files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default=os.path.join(script_dir, 'shops_data.json'),
+                        help="merged JSON output (default: shops_data.json)")
+    parser.add_argument('--import-db', action='store_true',
+                        help="import into the database instead of writing JSON")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="parser processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    paths = find_documents(args.sources)
+    if not paths:
+        print("Error: no .odt documents found.")
+        return 1
+
+    start = time.perf_counter()
+    merger = ingest(paths, args.workers)
+    data = merger.result()
+    print(f"Merged {len(paths)} documents: {len(data['categories'])} categories, "
+          f"{len(data['shops'])} shops ({merger.duplicates} duplicates dropped, "
+          f"{merger.repeated} repeated listings kept) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    if args.import_db:
+        from app import app, db
+        with app.app_context():
+            cat_count, shop_count = db.import_data(data)
+        print(f"Imported {cat_count} categories and {shop_count} shops.")
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"Data saved to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
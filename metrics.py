@@ -0,0 +1,133 @@
+"""
+Request timing spans, SQL query counts and a Prometheus-style /metrics page.
+
+Code on the hot path wraps its stages in `span('name')` from spans.py. Spans
+are recorded into per-process histograms and, while a request is running,
+into that request's stage breakdown. With SLOW_REQUEST_LOG_MS set, requests slower
+than the threshold are logged with the breakdown and their SQL query count.
+
+Histograms are per worker process; scrape each worker, or aggregate them in
+Prometheus.
+"""
+
+import contextvars
+import threading
+import time
+
+from flask import Response, current_app, g, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from spans import STAGE_SECONDS, Histogram, _request_stages, record, span  # noqa: F401 (re-exported)
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# SQL query count of the running request (None outside requests)
+_request_queries = contextvars.ContextVar('metrics_request_queries', default=None)
+
+
+class Counter:
+    """Monotonic counter keyed by one label"""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_value, value in sorted(self.snapshot().items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Request latency per endpoint.', 'endpoint')
+REQUEST_QUERIES = Histogram('http_request_sql_queries', 'SQL statements executed per request.', 'endpoint',
+                            QUERY_COUNT_BUCKETS)
+HISTOGRAMS = [REQUEST_SECONDS, REQUEST_QUERIES, STAGE_SECONDS]
+DB_ROUTING = Counter('db_routing_total', 'Query bind decisions per target (primary or replica).', 'target')
+COUNTERS = [DB_ROUTING]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def render_metrics():
+    """All histograms and counters in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for counter in COUNTERS:
+        lines.extend(counter.render())
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.slow_request_ms = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_LOG_MS')
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.extensions['metrics'] = self
+
+    @staticmethod
+    def metrics_view():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+    @staticmethod
+    def _start_request():
+        g._metrics_tokens = (_request_stages.set({}), _request_queries.set([0]))
+        g._metrics_start = time.perf_counter()
+
+    def _finish_request(self, exc=None):
+        tokens = g.pop('_metrics_tokens', None)
+        if tokens is None:
+            return
+        elapsed = time.perf_counter() - g.pop('_metrics_start')
+        stages, queries = _request_stages.get(), _request_queries.get()[0]
+        _request_stages.reset(tokens[0])
+        _request_queries.reset(tokens[1])
+
+        endpoint = request.endpoint or 'unknown'
+        if endpoint == 'metrics':
+            return
+        REQUEST_SECONDS.observe(endpoint, elapsed)
+        REQUEST_QUERIES.observe(endpoint, queries)
+
+        if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+            breakdown = ', '.join(f'{stage}={seconds * 1000:.1f}ms'
+                                  for stage, seconds in sorted(stages.items(), key=lambda kv: -kv[1]))
+            current_app.logger.warning(
+                f"Slow request {request.method} {request.full_path} took {elapsed * 1000:.1f}ms "
+                f"({queries} SQL queries): {breakdown or 'no spans'}")
+
+    @staticmethod
+    def _start_render(sender, template, context, **extra):
+        g._metrics_render_start = time.perf_counter()
+
+    @staticmethod
+    def _finish_render(sender, template, context, **extra):
+        start = g.pop('_metrics_render_start', None)
+        if start is not None:
+            record('render', time.perf_counter() - start)
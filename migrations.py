@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations.
+
+Run once per deploy with `python migrations.py`. Workers never run DDL: at
+startup they only check that the database is at SCHEMA_VERSION.
+"""
+
+import contextlib
+import datetime
+import os
+import sys
+
+# search_engine lives in python/
+PYTHON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python')
+if PYTHON_DIR not in sys.path:
+    sys.path.append(PYTHON_DIR)
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import inspect, select, func, text
+from sqlalchemy.schema import CreateIndex
+
+from database import db, make_engine
+
+# Kept off db.metadata so create_all never touches it
+_meta = MetaData()
+schema_versions = Table(
+    'schema_versions', _meta,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(500)),
+    Column('applied_at', DateTime),
+)
+
+
+# Version 1 schema, frozen: the tables as they were before versioned
+# migrations existed. Later columns, indexes and tables belong to later
+# migrations, never to this list.
+_baseline = MetaData()
+Table(
+    'categories', _baseline,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(10000), nullable=False),
+    Column('name_english', String(10000)),
+)
+Table(
+    'shops', _baseline,
+    Column('id', Integer, primary_key=True),
+    Column('category_id', Integer, ForeignKey('categories.id')),
+    Column('serial_no', String(5000)),
+    Column('name', String(20000)),
+    Column('proprietor', String(10000)),
+    Column('address', Text),
+    Column('mobile', String(10000)),
+    Column('transaction_status', String(10000)),
+    Column('whatsapp', String(5000)),
+    Column('email_web', String(10000)),
+    Column('products', Text),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+)
+Table(
+    'tags', _baseline,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(500), unique=True, nullable=False, index=True),
+    Column('name_bn', String(500)),
+    Column('created_at', DateTime),
+)
+Table(
+    'data_generations', _baseline,
+    Column('scope', String(200), primary_key=True),
+    Column('value', Integer, nullable=False),
+)
+Table(
+    'shop_tags', _baseline,
+    Column('id', Integer, primary_key=True),
+    Column('shop_id', Integer, ForeignKey('shops.id', ondelete='CASCADE'), nullable=False, index=True),
+    Column('tag_id', Integer, ForeignKey('tags.id', ondelete='CASCADE'), nullable=False, index=True),
+    Column('created_at', DateTime),
+    UniqueConstraint('shop_id', 'tag_id', name='unique_shop_tag'),
+)
+
+# Indexes added by migration 3; definitions come from the models
+MANAGED_INDEXES = [
+    'ix_categories_name',
+    'ix_shops_category_id',
+    'ix_shops_category_serial',
+    'ix_tags_name_lower',
+    'ix_shop_tags_shop_id',
+    'ix_shop_tags_tag_id',
+]
+
+# PostgreSQL advisory lock held by the runner applying a migration
+MIGRATION_LOCK_KEY = 0x4D49_4752
+
+
+def _create_tables(conn):
+    # checkfirst: databases created before versioning already have them
+    _baseline.create_all(conn)
+
+
+def _add_visiting_card(conn):
+    columns = {c['name'] for c in inspect(conn).get_columns('shops')}
+    if 'visiting_card' not in columns:
+        conn.execute(text("ALTER TABLE shops ADD COLUMN visiting_card VARCHAR(5000)"))
+
+
+def _create_index(conn, index):
+    # IF NOT EXISTS rather than checkfirst: SQLite reflection skips expression
+    # indexes such as ix_tags_name_lower, so checkfirst would try to recreate them
+    conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _model_index(name):
+    return next(i for table in db.metadata.sorted_tables for i in table.indexes if i.name == name)
+
+
+def _create_managed_indexes(conn):
+    """Create the lookup indexes declared on the models (see database.py)"""
+    for name in MANAGED_INDEXES:
+        _create_index(conn, _model_index(name))
+
+
+def _add_search_text(conn):
+    from search_engine import build_search_text
+
+    columns = {c['name'] for c in inspect(conn).get_columns('shops')}
+    if 'search_text' not in columns:
+        conn.execute(text("ALTER TABLE shops ADD COLUMN search_text TEXT"))
+
+    tags = {}
+    for shop_id, name, name_bn in conn.execute(text(
+            "SELECT st.shop_id, t.name, t.name_bn FROM shop_tags st JOIN tags t ON t.id = st.tag_id "
+            "ORDER BY st.id")):
+        tags.setdefault(shop_id, []).append({'name': name, 'name_bn': name_bn})
+
+    rows = conn.execute(text("SELECT id, name, products FROM shops")).fetchall()
+    updates = [{'id': shop_id, 'search_text': build_search_text(name, products, tags.get(shop_id, []))}
+               for shop_id, name, products in rows]
+    if updates:
+        conn.execute(text("UPDATE shops SET search_text = :search_text WHERE id = :id"), updates)
+
+    if conn.dialect.name == 'postgresql':
+        # Trigram GIN index serves the LIKE '%token%' candidate filter in search_shops
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_shops_search_text_trgm "
+            "ON shops USING gin (search_text gin_trgm_ops)"))
+
+
+def _index_shops_updated_at(conn):
+    """Index for the export updated_since filter"""
+    _create_index(conn, _model_index('ix_shops_updated_at'))
+
+
+def _create_change_log(conn):
+    db.metadata.tables['change_log'].create(conn, checkfirst=True)
+
+
+# (version, description, migration) -- append only, never renumber
+MIGRATIONS = [
+    (1, 'create base tables', _create_tables),
+    (2, 'add shops.visiting_card', _add_visiting_card),
+    (3, 'create managed indexes', _create_managed_indexes),
+    (4, 'add shops.search_text with trigram index on PostgreSQL', _add_search_text),
+    (5, 'index shops.updated_at', _index_shops_updated_at),
+    (6, 'create change_log', _create_change_log),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def current_version(conn):
+    """Highest applied migration, 0 for an unmanaged database"""
+    if not inspect(conn).has_table('schema_versions'):
+        return 0
+    return conn.execute(select(func.max(schema_versions.c.version))).scalar() or 0
+
+
+@contextlib.contextmanager
+def _locked_transaction(engine):
+    """Transaction holding the migration lock, so concurrent runners take turns"""
+    if engine.dialect.name == 'sqlite':
+        # The driver's own BEGIN is deferred and takes no lock until the first
+        # write; BEGIN IMMEDIATE takes the write lock before the version check
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level='AUTOCOMMIT')
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.exec_driver_sql('ROLLBACK')
+                raise
+            conn.exec_driver_sql('COMMIT')
+        return
+
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': MIGRATION_LOCK_KEY})
+        yield conn
+
+
+def migrate(engine):
+    """Apply every pending migration, each in its own locked transaction"""
+    with _locked_transaction(engine) as conn:
+        _meta.create_all(conn)
+
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        with _locked_transaction(engine) as conn:
+            # Re-read under the lock; a concurrent runner may have applied it
+            if current_version(conn) >= version:
+                continue
+            migration(conn)
+            conn.execute(schema_versions.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.datetime.now()
+            ))
+        applied.append(version)
+        print(f"Migration {version}: {description}")
+    return applied
+
+
+def verify(engine):
+    """Raise SchemaOutOfDate unless the database is at SCHEMA_VERSION"""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version < SCHEMA_VERSION:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, expected {SCHEMA_VERSION}. "
+            f"Run 'python migrations.py' before starting the app."
+        )
+    return version
+
+
+def main():
+    engine = make_engine()
+    applied = migrate(engine)
+    if not applied:
+        print(f"Schema already at version {SCHEMA_VERSION}.")
+    else:
+        print(f"Schema migrated to version {SCHEMA_VERSION}.")
+
+
+if __name__ == '__main__':
+    main()
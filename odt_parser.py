@@ -31,70 +31,264 @@ def normalize_mobile(mobile_text):
     clean = re.sub(r'[^\d০-৯\-,\s]', '', mobile_text)
     return clean.strip()
 
+MOBILE_PATTERN = re.compile(r'\d{5,}')
+
+
+class CategoryMatcher:
+    """Aho-Corasick automaton over category names.
+
+    find() returns the first category (in list order) whose name occurs
+    anywhere in a text, in one scan of the text however many categories
+    there are. Overlapping names are all seen, unlike a regex alternation.
+    """
+
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # lowest category index ending at (or suffix-linked from) each node
+
+        for index, (_, name, _) in enumerate(self.categories):
+            node = 0
+            for char in name:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                node = next_node
+            if self._best[node] is None:
+                self._best[node] = index
+
+        # Breadth-first failure links; each node inherits its suffix's best match
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+                queue.append(child)
+
+    def find(self, text):
+        """(cat_id, cat_name, name_english) of the first listed category contained in text, or None"""
+        best = None
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            found = self._best[node]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return self.categories[best] if best is not None else None
+
+
+TEXT_NS = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+TABLE_NS = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+
+P_TAG = TEXT_NS + 'p'
+CELL_TAG = TABLE_NS + 'table-cell'
+ROW_TAG = TABLE_NS + 'table-row'
+TABLE_TAG = TABLE_NS + 'table'
+
+
+def iter_rows(odt_path):
+    """Stream the table rows of an ODT document in a single pass.
+
+    content.xml is read straight from the zip with iterparse and every
+    element is dropped from the tree once it has been read, so the parse
+    itself holds only the current row; what the caller keeps is up to it.
+    Yields (table_index, row_index, cell_count, cells)
+    where cells holds, per cell, (cell_text, shop_cell_text): the first is
+    the paragraph texts and their children's tails joined by spaces (used
+    for headers), the second also includes the children's own text (used
+    for shop fields).
+    """
+    table_index = -1
+    row_index = 0
+    cells = None
+    cell = None
+    stack = []
+
+    with ZipFile(odt_path, 'r') as zip_ref, zip_ref.open('content.xml') as content:
+        for event, elem in ET.iterparse(content, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                if elem.tag == TABLE_TAG:
+                    table_index += 1
+                    row_index = 0
+                elif elem.tag == ROW_TAG:
+                    cells = []
+                elif elem.tag == CELL_TAG:
+                    cell = ([], [])
+                continue
+
+            stack.pop()
+            tag = elem.tag
+            if tag == P_TAG and cell is not None:
+                header_parts, shop_text = cell
+                if elem.text:
+                    header_parts.append(elem.text)
+                    shop_text.append(elem.text + " ")
+                for child in elem:
+                    if child.tail:
+                        header_parts.append(child.tail)
+                    if child.text:
+                        shop_text.append(child.text + " ")
+                    if child.tail:
+                        shop_text.append(child.tail + " ")
+            elif tag == CELL_TAG and cells is not None:
+                header_parts, shop_text = cell
+                cells.append((normalize_text(" ".join(header_parts).strip()),
+                              normalize_text("".join(shop_text).strip())))
+                cell = None
+            elif tag == ROW_TAG and cells is not None:
+                yield table_index, row_index, len(cells), cells
+                row_index += 1
+                cells = None
+
+            # Children of a paragraph are still needed when the paragraph ends
+            if stack and stack[-1].tag != P_TAG:
+                stack[-1].remove(elem)
+
+
+def _reduce_row(cell_count, cells):
+    """(cell_count, header texts, shop cell texts or None) of a row, or None for an empty row"""
+    row_text = [header for header, _ in cells if header]
+    if not row_text:
+        return None
+    shop_cells = [shop_text for _, shop_text in cells] if cell_count >= 5 else None
+    return cell_count, row_text, shop_cells
+
+
+class ShopCollector:
+    """Turns reduced rows into shops, tracking the category heading they fall under"""
+
+    def __init__(self, categories_list):
+        # Built once; matching a row no longer depends on the number of categories
+        self.category_matcher = CategoryMatcher(categories_list)
+        self.current_category_id = None
+        self.current_category_name = None
+        self.shops = []
+
+    def add_row(self, cell_count, row_text, cell_texts):
+        full_row_text = " ".join(row_text)
+
+        # Check for Category Headers: a short row that contains a known
+        # category name ("3 Old SS" or "Old MS") and no mobile number
+        # (shop rows usually have more columns or digits)
+        if len(full_row_text) < 100 and not MOBILE_PATTERN.search(bengali_to_english_num(full_row_text)):
+            category = self.category_matcher.find(full_row_text)
+            if category is not None:
+                self.current_category_id, self.current_category_name, _ = category
+                return
+
+        # Check if this row is a Shop Data Header
+        # Must look like: Serial No | Name | Proprietor ...
+        if cell_count >= 5:
+            header_text = row_text
+            
+            # Verify header keywords
+            if ('সিরিয়াল' in header_text or 'নং' in header_text) and \
+               ('প্রতিষ্ঠান' in header_text or 'মোবাইল' in header_text or 'প্রোপাইটার' in header_text):
+                # Identified shop table header. 
+                # Note: We don't need to do anything special, just ensures we don't treat it as valid shop data below
+                return
+
+        # Process potential shop entry
+        # Shop entry is valid if:
+        # 1. We have enough columns (let's say 4+)
+        # 2. It doesn't look like a header
+        # 3. It has a Serial Number (usually) OR has a valid Mobile Number
+        
+        if cell_count >= 5:
+            # Check if it's a header repetition
+            if 'সিরিয়াল' in cell_texts[0] or 'প্রতিষ্ঠান' in cell_texts[1]:
+                return
+                
+            # Robustness: Check if it looks like a shop
+            # Needs name (index 1) and maybe mobile (index 4) or address (index 3)
+            if len(cell_texts[1]) > 0:
+                shop = {
+                    "serial_no": cell_texts[0] if len(cell_texts) > 0 else "",
+                    "name": cell_texts[1] if len(cell_texts) > 1 else "",
+                    "proprietor": cell_texts[2] if len(cell_texts) > 2 else "",
+                    "address": cell_texts[3] if len(cell_texts) > 3 else "",
+                    "mobile": normalize_mobile(cell_texts[4]) if len(cell_texts) > 4 else "",
+                    "transaction_status": cell_texts[5] if len(cell_texts) > 5 else "",
+                    "whatsapp": cell_texts[6] if len(cell_texts) > 6 else "",
+                    "email_web": cell_texts[7] if len(cell_texts) > 7 else "",
+                    "products": cell_texts[8] if len(cell_texts) > 8 else "",
+                    "category_id": self.current_category_id,
+                    "category_name": self.current_category_name
+                }
+                self.shops.append(shop)
+
+
 def parse_odt(odt_path):
-    """Parse ODT file and extract shop data"""
-    
-    # Extract content.xml from ODT
-    content_xml_path = os.path.join(os.path.dirname(odt_path), 'extracted_odt', 'content.xml')
-    
-    if not os.path.exists(content_xml_path):
-        # Extract from ODT if not already extracted
-        with ZipFile(odt_path, 'r') as zip_ref:
-            extract_dir = os.path.join(os.path.dirname(odt_path), 'extracted_odt')
-            zip_ref.extractall(extract_dir)
-    
-    # Parse XML
-    tree = ET.parse(content_xml_path)
-    root = tree.getroot()
-    
-    # Define namespaces used in ODT
-    ns = {
-        'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
-        'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
-        'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
-    }
+    """Parse ODT file and extract shop data.
+
+    Categories come from index tables. In the usual layout they precede the
+    shop tables, and shop rows are processed as they stream past; only the
+    rows before the first shop table are held. If an index table turns up
+    after shop rows were processed, the document is read a second time with
+    the complete category list.
+    """
     
     categories_list = []
-    
-    # helper to extract text from a cell
-    def get_cell_text(cell):
-        texts = []
-        for p in cell.findall('.//text:p', ns):
-            if p.text: texts.append(p.text)
-            for child in p:
-                if child.tail: texts.append(child.tail)
-        return normalize_text(" ".join(texts).strip())
-
-    # Step 1: Scan for Index Tables to build categories_list
+    seen_category_ids = set()
+    index_tables = set()
+
+    pending = []        # reduced rows seen before the category index is known
+    collector = None    # set once shop tables start
+    late_categories = False
+
     print("Scanning for categories in Index tables...")
-    tables = root.findall('.//table:table', ns)
-    
-    for table in tables:
-        rows = table.findall('.//table:table-row', ns)
-        if not rows: 
-            continue
+    for table_index, row_index, cell_count, cells in iter_rows(odt_path):
+        if row_index == 0:
+            # Check header row for "ক্যাটেগরি"
+            header_text = " ".join(header for header, _ in cells)
+            if "ক্যাটেগরি" in header_text and "সিরিয়াল" in header_text:
+                # This is an index table
+                index_tables.add(table_index)
+        elif table_index in index_tables and cell_count >= 2:
+            # Cell 0: Serial (ID), Cell 1: Name
+            cat_id_text = bengali_to_english_num(cells[0][0])
+            cat_name = cells[1][0]
             
-        # Check header row for "ক্যাটেগরি"
-        header_cells = rows[0].findall('.//table:table-cell', ns)
-        header_text = " ".join([get_cell_text(c) for c in header_cells])
-        
-        if "ক্যাটেগরি" in header_text and "সিরিয়াল" in header_text:
-            # This is an index table
-            for row in rows[1:]: # Skip header
-                cells = row.findall('.//table:table-cell', ns)
-                if len(cells) >= 2:
-                    # Cell 0: Serial (ID), Cell 1: Name
-                    cat_id_text = bengali_to_english_num(get_cell_text(cells[0]))
-                    cat_name = get_cell_text(cells[1])
-                    
-                    # Clean up ID
-                    cat_id_match = re.search(r'\d+', cat_id_text)
-                    if cat_id_match and cat_name:
-                        cat_id = int(cat_id_match.group())
-                        # Check if already added
-                        if not any(c[0] == cat_id for c in categories_list):
-                            categories_list.append((cat_id, cat_name, "")) # English name empty
-                            print(f"DEBUG: Found Category {cat_id}: {cat_name}")
+            # Clean up ID
+            cat_id_match = re.search(r'\d+', cat_id_text)
+            if cat_id_match and cat_name:
+                cat_id = int(cat_id_match.group())
+                # Check if already added
+                if cat_id not in seen_category_ids:
+                    seen_category_ids.add(cat_id)
+                    categories_list.append((cat_id, cat_name, "")) # English name empty
+                    print(f"DEBUG: Found Category {cat_id}: {cat_name}")
+                    if collector is not None:
+                        late_categories = True
+
+        row = _reduce_row(cell_count, cells)
+        if row is None or late_categories:
+            continue
+        if collector is None and categories_list and table_index not in index_tables:
+            # First row outside the index tables: the category list is complete
+            collector = ShopCollector(sorted(categories_list, key=lambda x: x[0]))
+            for pending_row in pending:
+                collector.add_row(*pending_row)
+            pending = []
+        if collector is None:
+            pending.append(row)
+        else:
+            collector.add_row(*row)
 
     if not categories_list:
         print("WARNING: No dynamic categories found. Falling back to basics or manual check needed.")
@@ -109,116 +303,22 @@ def parse_odt(odt_path):
             "name": normalize_text(name_bn),
             "name_english": name_en # This will be empty for now, can be added later
         }
-    
-    shops = []
-    current_category_id = None
-    current_category_name = None
-    
-    # Map for easy lookup
-    cat_map = {c[1]: c[0] for c in categories_list} # Name -> ID
-    
-    for table in tables:
-        rows = table.findall('.//table:table-row', ns)
-        
-        for row in rows:
-            cells = row.findall('.//table:table-cell', ns)
-            row_text = [] # simple text list
-            full_row_text = ""
-            
-            for cell in cells:
-                cell_text = get_cell_text(cell)
-                if cell_text:
-                    row_text.append(cell_text)
-            
-            full_row_text = " ".join(row_text)
-            
-            # Skip empty rows
-            if not full_row_text.strip():
-                continue
 
-            # Check for Category Headers (Single cell or specific text)
-            # Match against our dynamic list
-            matched_cat = False
-            
-            # Heuristic 1: Exact or fuzzy match with known category names
-            # We check if the row text *contains* a collected category name
-            # or if it *is* the category name
-            
-            cleaned_row_text = bengali_to_english_num(full_row_text)
-            
-            for cat_id, cat_name, _ in categories_list:
-                # Check for "ID CategoryName" pattern or just "CategoryName"
-                # e.g. "3 Old SS" or "Old MS"
-                
-                # Rigid check: if line is short and matches category name
-                if len(full_row_text) < 100:
-                    if cat_name in full_row_text:
-                         # Verify it's not a shop row (shop rows usually have more columns or digits)
-                        has_mobile = re.search(r'\d{5,}', cleaned_row_text)
-                        if not has_mobile:
-                            current_category_id = cat_id
-                            current_category_name = cat_name
-                            matched_cat = True
-                            # print(f"DEBUG: Switched to Category: {cat_name}")
-                            break
-            
-            if matched_cat:
-                continue
-
-            # Check if this row is a Shop Data Header
-            # Must look like: Serial No | Name | Proprietor ...
-            if len(cells) >= 5:
-                header_text = row_text
-                
-                # Verify header keywords
-                if ('সিরিয়াল' in header_text or 'নং' in header_text) and \
-                   ('প্রতিষ্ঠান' in header_text or 'মোবাইল' in header_text or 'প্রোপাইটার' in header_text):
-                    # Identified shop table header. 
-                    # Note: We don't need to do anything special, just ensures we don't treat it as valid shop data below
-                    continue
-
-            # Process potential shop entry
-            # Shop entry is valid if:
-            # 1. We have enough columns (let's say 4+)
-            # 2. It doesn't look like a header
-            # 3. It has a Serial Number (usually) OR has a valid Mobile Number
-            
-            if len(cells) >= 5:
-                cell_texts = []
-                for cell in cells:
-                    t = ""
-                    for p in cell.findall('.//text:p', ns):
-                        if p.text: t += p.text + " "
-                        for c in p:
-                            if c.text: t += c.text + " "
-                            if c.tail: t += c.tail + " "
-                    cell_texts.append(normalize_text(t.strip()))
-                
-                # Check if it's a header repetition
-                if 'সিরিয়াল' in cell_texts[0] or 'প্রতিষ্ঠান' in cell_texts[1]:
-                    continue
-                    
-                # Robustness: Check if it looks like a shop
-                # Needs name (index 1) and maybe mobile (index 4) or address (index 3)
-                if len(cell_texts[1]) > 0:
-                    shop = {
-                        "serial_no": cell_texts[0] if len(cell_texts) > 0 else "",
-                        "name": cell_texts[1] if len(cell_texts) > 1 else "",
-                        "proprietor": cell_texts[2] if len(cell_texts) > 2 else "",
-                        "address": cell_texts[3] if len(cell_texts) > 3 else "",
-                        "mobile": normalize_mobile(cell_texts[4]) if len(cell_texts) > 4 else "",
-                        "transaction_status": cell_texts[5] if len(cell_texts) > 5 else "",
-                        "whatsapp": cell_texts[6] if len(cell_texts) > 6 else "",
-                        "email_web": cell_texts[7] if len(cell_texts) > 7 else "",
-                        "products": cell_texts[8] if len(cell_texts) > 8 else "",
-                        "category_id": current_category_id,
-                        "category_name": current_category_name
-                    }
-                    shops.append(shop)
+    if collector is None:
+        collector = ShopCollector(categories_list)
+        for pending_row in pending:
+            collector.add_row(*pending_row)
+    elif late_categories:
+        print("Index table found after shop rows; re-reading the document...")
+        collector = ShopCollector(categories_list)
+        for _, _, cell_count, cells in iter_rows(odt_path):
+            row = _reduce_row(cell_count, cells)
+            if row is not None:
+                collector.add_row(*row)
 
     return {
         "categories": list(categories.values()),
-        "shops": shops
+        "shops": collector.shops
     }
 
 def main():
@@ -0,0 +1,178 @@
+"""
+Rendered page cache for the read-heavy HTML views.
+
+Pages are keyed by route, locale and the data generation of every scope the
+page depends on (see ExtendedSQLAlchemy.get_generations). Writes bump the
+generations of the scopes they touch, so stale pages simply stop matching and
+age out of the store. A page about to be stored is rendered from the primary,
+like the generations in its key, never from a possibly lagging replica.
+"""
+
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request, session, make_response, Response
+from flask_babel import get_locale
+
+from database import primary_reads
+
+
+class MemoryBackend:
+    """Per-worker LRU store"""
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskBackend:
+    """File-per-page store shared by every worker on the host.
+
+    Point the directory at a tmpfs such as /dev/shm to keep it in shared memory.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, directory, max_entries=2000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, body):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            # Atomic rename so concurrent readers never see a partial page
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Drop the oldest pages once the store grows past max_entries"""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.html')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.html'):
+                os.remove(entry.path)
+
+
+class PageCache:
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.enabled = False
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.db = db or self.db
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        backend = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+        max_entries = app.config.get('PAGE_CACHE_MAX_ENTRIES', 2000)
+
+        if backend == 'disk':
+            self.backend = DiskBackend(app.config['PAGE_CACHE_DIR'], max_entries)
+        elif backend == 'memory':
+            self.backend = MemoryBackend(max_entries)
+        else:
+            raise ValueError(f"Unknown PAGE_CACHE_BACKEND: {backend}")
+
+        app.extensions['page_cache'] = self
+
+    def make_key(self, scopes):
+        """Build the cache key for the current request"""
+        # Read generations before the view queries anything: a write that lands
+        # mid-render then leaves the page stored under the already-stale key.
+        generations = self.db.get_generations(scopes)
+        parts = [
+            request.full_path,
+            str(get_locale()),
+            # The language toggle in base.html renders from the raw session value
+            session.get('lang', ''),
+        ]
+        parts.extend(f'{scope}={generations[scope]}' for scope in scopes)
+        return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def cached(self, *scopes):
+        """Cache a GET view's rendered HTML.
+
+        Scopes are format strings filled from the view arguments,
+        e.g. 'shop:{shop_id}'.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flash messages are one-off renders
+                if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+
+                key = self.make_key([s.format(**kwargs) for s in scopes])
+                body = self.backend.get(key)
+                if body is not None:
+                    self.hits += 1
+                    return Response(body, mimetype='text/html')
+
+                self.misses += 1
+                with primary_reads():
+                    response = make_response(view(**kwargs))
+                if response.status_code == 200 and response.mimetype == 'text/html':
+                    self.backend.set(key, response.get_data())
+                return response
+            return wrapper
+        return decorator
+
+    def clear(self):
+        self.backend.clear()
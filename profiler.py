@@ -0,0 +1,123 @@
+"""
+Opt-in sampling profiler for live requests.
+
+A profiled request gets a sampler thread that records the request thread's
+Python stack every PROFILE_INTERVAL_MS. Stacks are aggregated per endpoint in
+the collapsed ("folded") format and rewritten to PROFILE_DIR/<endpoint>.<pid>.folded
+after each profiled request, ready for a flamegraph renderer:
+
+    flamegraph.pl profiles/index.*.folded > index.svg
+
+or drop a file on https://www.speedscope.app. A request is profiled when a
+PROFILE_SAMPLE_RATE draw selects it, or when it carries the PROFILE_HEADER
+with the PROFILE_TOKEN value. With neither configured no hooks are installed;
+otherwise an unprofiled request costs one random() call and a header lookup.
+"""
+
+import os
+import random
+import sys
+import threading
+
+from flask import current_app, g, request
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _collapse(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class StackSampler:
+    """Samples one thread's stack on a background thread until stopped"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = _collapse(frame)
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+
+class RequestProfiler:
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.header = None
+        self.token = None
+        self.interval = 0.005
+        self.directory = None
+        self._profiles = {}  # endpoint -> {collapsed stack: samples}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE') or 0.0
+        self.header = app.config.get('PROFILE_HEADER')
+        self.token = app.config.get('PROFILE_TOKEN')
+        self.interval = app.config.get('PROFILE_INTERVAL_MS', 5) / 1000
+        self.directory = app.config.get('PROFILE_DIR')
+        if self.sample_rate > 0 or (self.header and self.token):
+            app.before_request(self._start_request)
+            app.teardown_request(self._finish_request)
+        app.extensions['request_profiler'] = self
+
+    def _wanted(self):
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        return bool(self.token) and request.headers.get(self.header) == self.token
+
+    def _start_request(self):
+        if self._wanted():
+            g._profiler = StackSampler(threading.get_ident(), self.interval).start()
+
+    def _finish_request(self, exc=None):
+        sampler = g.pop('_profiler', None)
+        if sampler is None:
+            return
+        stacks = sampler.stop()
+        if not stacks:
+            return
+        endpoint = request.endpoint or 'unknown'
+        try:
+            self._save(endpoint, stacks)
+        except OSError as e:
+            current_app.logger.warning(f"Could not write profile for {endpoint}: {e}")
+
+    def _save(self, endpoint, stacks):
+        with self._lock:
+            profile = self._profiles.setdefault(endpoint, {})
+            for stack, count in stacks.items():
+                profile[stack] = profile.get(stack, 0) + count
+            lines = [f'{stack} {count}\n' for stack, count in profile.items()]
+
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{endpoint}.{os.getpid()}.folded')
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(tmp_path, path)
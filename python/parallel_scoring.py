@@ -0,0 +1,211 @@
+"""
+Sharded lexical scoring over a persistent process pool.
+
+The search corpus (shop id, normalized name, search_text) is published once
+per data generation into a shared-memory block, split into one shard per
+worker. Workers decode their shard the first time they see a snapshot and
+keep it cached, so a query only ships the query terms and the semantic scores
+to each worker. Each shard returns its own top-N and the parent merges them.
+
+The pool is started with forkserver (spawn where that is unavailable):
+forking the already multithreaded web process could copy locks held by other
+threads into the workers and deadlock them. Workers are therefore fresh
+interpreters; like any spawn-started process they re-import a script run as
+__main__ (e.g. `python app.py`), but not a WSGI/ASGI server's entry point.
+"""
+
+import atexit
+import heapq
+import itertools
+import multiprocessing
+import pickle
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from search_engine import score_search_text, fuse_scores
+
+# Offset table entry per shard: (start, length) into the shared buffer
+_OFFSET = struct.Struct('<QQ')
+
+# Pool size when none is configured; each web worker runs its own pool
+DEFAULT_WORKERS = 2
+
+# Worker-side cache: shard index -> (snapshot name, decoded shard)
+_worker_shards = {}
+_worker_segments = {}
+
+
+def _attach(name):
+    """Open an existing shared memory block without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: pool workers share the parent's resource tracker,
+        # so re-registering the block is a no-op and the parent still unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+def _load_shard(snapshot_name, shard_index):
+    cached = _worker_shards.get(shard_index)
+    if cached is not None and cached[0] == snapshot_name:
+        return cached[1]
+
+    segment = _worker_segments.get(snapshot_name)
+    if segment is None:
+        for old in _worker_segments.values():
+            old.close()
+        _worker_segments.clear()
+        segment = _attach(snapshot_name)
+        _worker_segments[snapshot_name] = segment
+
+    start, length = _OFFSET.unpack_from(segment.buf, shard_index * _OFFSET.size)
+    shard = pickle.loads(segment.buf[start:start + length])
+    _worker_shards[shard_index] = (snapshot_name, shard)
+    return shard
+
+
+def _score_shard(snapshot_name, shard_index, query_tokens, normalized_query, semantic_scores, limit, fuzzy=None):
+    """Worker task: (-score, position, shop_id) for the shard's hits, best first"""
+    position, rows = _load_shard(snapshot_name, shard_index)
+    hits = []
+    for offset, (shop_id, shop_name, search_text) in enumerate(rows):
+        score = score_search_text(shop_name, search_text, query_tokens, normalized_query, fuzzy)
+        score = fuse_scores(score, semantic_scores.get(shop_id, 0))
+        if score > 0:
+            hits.append((-score, position + offset, shop_id))
+    if limit is not None:
+        return heapq.nsmallest(limit, hits)
+    hits.sort()
+    return hits
+
+
+def _pool_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # The fork server only needs the scoring code, not the app's __main__
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class ShardedScorer:
+    def __init__(self, workers=None):
+        self.workers = workers or DEFAULT_WORKERS
+        self._pool = None
+        self._segment = None
+        self._users = {}    # segment name -> rank calls still reading it
+        self._retired = {}  # segment name -> replaced segment awaiting its last reader
+        self._generation = None
+        self._shard_count = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a broken pool so the next _get_pool starts a fresh one"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def publish(self, generation, rows):
+        """Replace the corpus snapshot with rows of (shop_id, normalized_name, search_text)"""
+        with self._lock:
+            if generation == self._generation and self._segment is not None:
+                return
+
+            shard_size = max(1, -(-len(rows) // self.workers))
+            shards = [pickle.dumps((start, rows[start:start + shard_size]), protocol=pickle.HIGHEST_PROTOCOL)
+                      for start in range(0, len(rows), shard_size)] or [pickle.dumps((0, []))]
+
+            header = _OFFSET.size * len(shards)
+            segment = shared_memory.SharedMemory(create=True, size=header + sum(len(s) for s in shards))
+            offset = header
+            for index, payload in enumerate(shards):
+                _OFFSET.pack_into(segment.buf, index * _OFFSET.size, offset, len(payload))
+                segment.buf[offset:offset + len(payload)] = payload
+                offset += len(payload)
+
+            # Queries already dispatched against the previous block keep it
+            # alive until the last of them has finished
+            previous = self._segment
+            if previous is not None:
+                if self._users.get(previous.name):
+                    self._retired[previous.name] = previous
+                else:
+                    self._unlink(previous)
+            self._segment = segment
+            self._shard_count = len(shards)
+            self._generation = generation
+
+    def is_current(self, generation):
+        return self._segment is not None and self._generation == generation
+
+    def rank(self, query_tokens, normalized_query, semantic_scores, limit=None, fuzzy=None):
+        """Shop ids ordered like rank_search_candidates, merged across shards"""
+        with self._lock:
+            name, shard_count = self._segment.name, self._shard_count
+            self._users[name] = self._users.get(name, 0) + 1
+        try:
+            results = self._run_shards(name, shard_count, query_tokens, normalized_query,
+                                       semantic_scores, limit, fuzzy)
+        finally:
+            with self._lock:
+                self._users[name] -= 1
+                if not self._users[name]:
+                    del self._users[name]
+                    self._unlink(self._retired.pop(name, None))
+
+        merged = heapq.merge(*results)
+        if limit is not None:
+            merged = itertools.islice(merged, limit)
+        return [shop_id for _, _, shop_id in merged]
+
+    def _run_shards(self, name, shard_count, *args):
+        """Every shard's hits; a pool broken by a dead worker is replaced and the query retried once"""
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                futures = [pool.submit(_score_shard, name, index, *args) for index in range(shard_count)]
+                return [f.result() for f in futures]
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                if attempt:
+                    raise
+
+    @staticmethod
+    def _unlink(segment):
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        with self._lock:
+            for segment in self._retired.values():
+                self._unlink(segment)
+            self._unlink(self._segment)
+            self._retired = {}
+            self._segment = None
+            self._generation = None
+
+
+_shared_scorer = None
+
+
+def get_sharded_scorer(workers=None):
+    """Process-wide ShardedScorer (one pool per web worker)"""
+    global _shared_scorer
+    if _shared_scorer is None:
+        _shared_scorer = ShardedScorer(workers)
+        atexit.register(_shared_scorer.close)
+    return _shared_scorer
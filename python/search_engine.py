@@ -1,4 +1,6 @@
 import re
+import sys
+from types import MappingProxyType
 
 DOMAIN_MAP = {
     # High frequency terms (40+)
@@ -476,18 +478,49 @@ def normalize_text(text):
     
     return text
 
+def _domain_groups(domain_map):
+    """Each DOMAIN_MAP entry as (key, normalized English key + variants, deduplicated in order)"""
+    for key, mapping in domain_map.items():
+        variants = mapping if isinstance(mapping, list) else [mapping]
+        group = [normalize_text(key)] + [normalize_text(v) for v in variants]
+        yield key, list(dict.fromkeys(t for t in group if t))
+
+
+def compile_synonyms(domain_map):
+    """Bidirectional synonym table: normalized token -> tuple of its other spellings.
+
+    English keys expand to their Bengali variants and every variant expands
+    to the key and its sibling variants. A token shared by several entries
+    (see domain_map_collisions) expands to the union of their groups.
+    """
+    table = {}
+    for _, group in _domain_groups(domain_map):
+        for token in group:
+            expansions = table.setdefault(token, {})
+            for other in group:
+                if other != token:
+                    expansions[other] = None
+    return MappingProxyType({token: tuple(expansions) for token, expansions in table.items()})
+
+
+def domain_map_collisions(domain_map=None):
+    """Normalized spellings claimed by more than one DOMAIN_MAP entry: {token: [keys]}"""
+    owners = {}
+    for key, group in _domain_groups(DOMAIN_MAP if domain_map is None else domain_map):
+        for token in group:
+            owners.setdefault(token, []).append(key)
+    return {token: keys for token, keys in owners.items() if len(keys) > 1}
+
+
+# Compiled once at import; shared by semantic indexing and query encoding
+SYNONYMS = compile_synonyms(DOMAIN_MAP)
+
+
 def custom_tokenizer(text):
-    tokens = list(tokenize(text))
     augmented = []
-    for t in tokens:
+    for t in tokenize(text):
         augmented.append(t)
-        if t.lower() in DOMAIN_MAP:
-            mapping = DOMAIN_MAP[t.lower()]
-            if isinstance(mapping, list):
-                augmented.extend(mapping)
-            else:
-                augmented.append(mapping)
-            
+        augmented.extend(SYNONYMS.get(t, ()))
     return augmented
 
 def tokenize(text):
@@ -495,14 +528,31 @@ def tokenize(text):
     tokens = re.split(r'\s+|[,;.]+', norm)
     return set(t for t in tokens if t)
 
-def calculate_score(shop, query_tokens, normalized_query):
-    score = 0
-    shop_name = normalize_text(shop['name'])
-    shop_products = normalize_text(shop['products'] or "")
-    shop_tags_list = [normalize_text(t['name']) for t in shop['tags']]
-    shop_tags_bn_list = [normalize_text(t['name_bn']) for t in shop['tags'] if t['name_bn']]
+def build_search_text(name, products, tags):
+    """Normalized text a shop is matched against (name, products, tag names)"""
+    shop_name = normalize_text(name)
+    shop_products = normalize_text(products or "")
+    shop_tags_list = [normalize_text(t['name']) for t in tags]
+    shop_tags_bn_list = [normalize_text(t['name_bn']) for t in tags if t['name_bn']]
     
-    all_shop_text = f"{shop_name} {shop_products} {' '.join(shop_tags_list)} {' '.join(shop_tags_bn_list)}"
+    return f"{shop_name} {shop_products} {' '.join(shop_tags_list)} {' '.join(shop_tags_bn_list)}"
+
+# Match tier for a query token whose spelling correction (spelling.py) is in
+# the shop: below the prefix/substring tier
+FUZZY_MATCH = 0.5
+FUZZY_SCORE = 3
+
+def calculate_score(shop, query_tokens, normalized_query, fuzzy=None):
+    all_shop_text = build_search_text(shop['name'], shop['products'], shop['tags'])
+    return score_search_text(normalize_text(shop['name']), all_shop_text, query_tokens, normalized_query, fuzzy)
+
+def score_search_text(shop_name, all_shop_text, query_tokens, normalized_query, fuzzy=None):
+    """calculate_score on a precomputed build_search_text() result.
+
+    fuzzy: {query token: spelling corrections}, matched when a token has no
+    exact or partial match in the shop.
+    """
+    score = 0
     shop_tokens = tokenize(all_shop_text)
     
     if normalized_query in all_shop_text:
@@ -535,6 +585,10 @@ def calculate_score(shop, query_tokens, normalized_query):
                      score += 5 
                      token_found = True
                      break
+
+            if not token_found and fuzzy and q_token in fuzzy and not fuzzy[q_token].isdisjoint(shop_tokens):
+                matches += FUZZY_MATCH
+                score += FUZZY_SCORE
         
     if matches >= query_token_count and query_token_count > 0:
         score += 100 
@@ -545,3 +599,22 @@ def calculate_score(shop, query_tokens, normalized_query):
              return 0
              
     return score
+
+def fuse_scores(score, sem_score):
+    """Combine a lexical score with a (0-100 scaled) semantic score"""
+    if sem_score > 0:
+        if score > 0:
+            score += sem_score + 20
+        else:
+            if sem_score > 5:
+                score = sem_score
+    return score
+
+
+if __name__ == '__main__':
+    # python python/search_engine.py -- list DOMAIN_MAP spellings that collide after normalize_bengali
+    collisions = domain_map_collisions()
+    for token, keys in sorted(collisions.items(), key=lambda item: item[1]):
+        print(f"{token!r}: {', '.join(keys)}")
+    print(f"{len(collisions)} normalized spellings shared by more than one DOMAIN_MAP entry.")
+    sys.exit(1 if collisions else 0)
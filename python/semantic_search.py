@@ -1,12 +1,25 @@
 
+"""
+TF-IDF semantic index over shop names, products and tags.
+
+Serving (load + search) needs only NumPy/SciPy; pandas, scikit-learn and the
+database layer (Flask-SQLAlchemy) are imported inside the build path, so
+workers and tools that only query the index do not pay for them at import
+time (see benchmarks/import_time.py).
+Queries are encoded by QueryEncoder from the vocabulary and IDF exported at
+build time (tfidf_state.pkl) rather than by the pickled TfidfVectorizer.
+The state also carries the uncapped term list used by python/spelling.py.
+"""
+
+import itertools
+import math
 import os
 import pickle
-import sqlite3
-import pandas as pd
-import numpy as np
 import sys
-import json
-import re
+import threading
+
+import numpy as np
+from scipy import sparse
 
 # Ensure project root is in path
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,32 +27,105 @@ if BASE_DIR not in sys.path:
     sys.path.append(BASE_DIR)
 
 import config
-from search_engine import tokenize, custom_tokenizer, DOMAIN_MAP
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from spans import span
+from search_engine import custom_tokenizer
+
+
+def normalize(matrix):
+    """L2-normalize the rows of a sparse matrix, like sklearn.preprocessing.normalize"""
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64, copy=True)
+    lengths = np.diff(matrix.indptr)
+    rows = np.repeat(np.arange(matrix.shape[0]), lengths)
+    # bincount sums each row in order, as sklearn's row loop does
+    norms = np.sqrt(np.bincount(rows, weights=matrix.data * matrix.data, minlength=matrix.shape[0]))
+    norms[norms == 0] = 1.0
+    matrix.data /= np.repeat(norms, lengths)
+    return matrix
+
+
+class QueryEncoder:
+    """TfidfVectorizer.transform for queries, from its exported vocabulary and IDF.
+
+    Produces the same L2-normalized rows as the fitted vectorizer (lowercase,
+    custom_tokenizer, raw counts times IDF) without sklearn's per-call
+    machinery: one dict of counts per query and a single CSR matrix per batch.
+    """
+
+    def __init__(self, vocabulary, idf):
+        self.vocabulary = vocabulary
+        self.idf = [float(w) for w in idf]
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        return cls(dict(vectorizer.vocabulary_), vectorizer.idf_)
+
+    def state(self):
+        """Picklable without sklearn: {'vocabulary': {term: column}, 'idf': float64 array}"""
+        return {'vocabulary': self.vocabulary, 'idf': np.array(self.idf, dtype=np.float64)}
+
+    def transform(self, queries):
+        indptr, indices, data = [0], [], []
+        for query in queries:
+            counts = {}
+            for token in custom_tokenizer(query.lower()):
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+
+            columns = sorted(counts)
+            weights = [counts[c] * self.idf[c] for c in columns]
+            # Accumulate in column order, as sklearn's row normalization does
+            squares = 0.0
+            for weight in weights:
+                squares += weight * weight
+            norm = math.sqrt(squares)
+            if norm > 0:
+                weights = [weight / norm for weight in weights]
+
+            indices.extend(columns)
+            data.extend(weights)
+            indptr.append(len(indices))
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(queries), len(self.idf)),
+                                 dtype=np.float64)
 
 
 class SemanticSearch:
-    def __init__(self, vectorizer_path=None, matrix_path=None, shop_ids_path=None):
+    def __init__(self, vectorizer_path=None, matrix_path=None, shop_ids_path=None, state_path=None):
         # Use config for paths if not provided
         self.vectorizer_path = vectorizer_path or os.path.join(config.MODELS_DIR, "tfidf_vectorizer.pkl")
         self.matrix_path = matrix_path or os.path.join(config.MODELS_DIR, "tfidf_matrix.pkl")
         self.shop_ids_path = shop_ids_path or os.path.join(config.MODELS_DIR, "shop_ids.pkl")
-        
+        self.state_path = state_path or os.path.join(config.MODELS_DIR, "tfidf_state.pkl")
+
         self.vectorizer = None
+        self.encoder = None
+        # Every token of the indexed texts; unlike the encoder vocabulary it is
+        # not capped by max_features (the spelling corrector's word list)
+        self.terms = None
         self.tfidf_matrix = None
         self.shop_ids = None
+        self._normalized = None
 
     def get_data_from_db(self, db_path=None):
-        db_path = db_path or config.DB_PATH
-        conn = sqlite3.connect(db_path)
-        query = """
+        import pandas as pd
+        from database import sqlite_connect, make_engine
+
+        if db_path:
+            conn = sqlite_connect(db_path)
+            concat = "GROUP_CONCAT({}, ' ')"
+        else:
+            # config.SQLALCHEMY_DATABASE_URI, which DATABASE_URL may point away from DB_PATH
+            engine = make_engine()
+            conn = engine.connect()
+            concat = "GROUP_CONCAT({}, ' ')" if engine.dialect.name == 'sqlite' else "STRING_AGG({}, ' ')"
+
+        query = f"""
             SELECT 
                 s.id as shop_id,
                 s.name as shop_name, 
                 s.products as shop_products,
-                GROUP_CONCAT(t.name, ' ') as tag_names,
-                GROUP_CONCAT(t.name_bn, ' ') as tag_names_bn
+                {concat.format('t.name')} as tag_names,
+                {concat.format('t.name_bn')} as tag_names_bn
             FROM shops s
             LEFT JOIN shop_tags st ON s.id = st.shop_id
             LEFT JOIN tags t ON st.tag_id = t.id
@@ -66,8 +152,7 @@ class SemanticSearch:
         return df
 
     def build_index(self, db_path=None):
-        db_path = db_path or config.DB_PATH
-        print(f"Fetching data from live database ({db_path}) for semantic index...")
+        print(f"Fetching data from live database ({db_path or config.SQLALCHEMY_DATABASE_URI}) for semantic index...")
         df = self.get_data_from_db(db_path)
         
         if df.empty:
@@ -80,6 +165,8 @@ class SemanticSearch:
         
         print(f"Indexing {len(X_text)} shops...")
 
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
         # Train Vectorizer
         self.vectorizer = TfidfVectorizer(
             tokenizer=custom_tokenizer, 
@@ -90,6 +177,8 @@ class SemanticSearch:
         
         # Build TF-IDF Matrix
         self.tfidf_matrix = self.vectorizer.fit_transform(X_text)
+        self.encoder = QueryEncoder.from_vectorizer(self.vectorizer)
+        self.terms = frozenset(itertools.chain.from_iterable(custom_tokenizer(text.lower()) for text in X_text))
         
         print("Indexing complete.")
         self.save()
@@ -98,29 +187,50 @@ class SemanticSearch:
         """
         Returns list of dicts: {'shop_id': id, 'score': similarity_score}
         """
-        if self.tfidf_matrix is None or self.vectorizer is None or self.shop_ids is None:
+        return self.search_batch([query], top_k)[0]
+
+    def search_batch(self, queries, top_k=20):
+        """search() for many queries: one transform and one sparse matrix product"""
+        if self.tfidf_matrix is None or self.encoder is None or self.shop_ids is None:
             self.load()
             if self.tfidf_matrix is None:
-                return []
+                return [[] for _ in queries]
+        if not queries:
+            return []
 
-        query_vec = self.vectorizer.transform([query])
-        
-        # Calculate cosine similarity
-        cosine_similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
-        
-        # Get top indices
-        related_docs_indices = cosine_similarities.argsort()[:-top_k:-1]
-        
-        results = []
-        for idx in related_docs_indices:
-            score = cosine_similarities[idx]
-            if score > 0.001: 
-                results.append({
-                    "shop_id": self.shop_ids[idx],
-                    "score": round(float(score), 4)
-                })
-        
-        return results
+        with span('transform'):
+            query_vecs = normalize(self.encoder.transform(queries))
+
+        with span('cosine'):
+            return self._top_matches(query_vecs, top_k)
+
+    def _top_matches(self, query_vecs, top_k):
+        # cosine_similarity(query_vecs, tfidf_matrix), computed for all queries at once
+        similarities = (query_vecs @ self._normalized_matrix().T).tocsr()
+
+        batch_results = []
+        for row in range(similarities.shape[0]):
+            cosine_similarities = similarities[row].toarray().flatten()
+
+            # Get top indices
+            related_docs_indices = cosine_similarities.argsort()[:-top_k:-1]
+
+            results = []
+            for idx in related_docs_indices:
+                score = cosine_similarities[idx]
+                if score > 0.001:
+                    results.append({
+                        "shop_id": self.shop_ids[idx],
+                        "score": round(float(score), 4)
+                    })
+            batch_results.append(results)
+
+        return batch_results
+
+    def _normalized_matrix(self):
+        if self._normalized is None or self._normalized[0] is not self.tfidf_matrix:
+            self._normalized = (self.tfidf_matrix, normalize(self.tfidf_matrix))
+        return self._normalized[1]
 
     def save(self):
         # Ensure directory exists
@@ -132,12 +242,13 @@ class SemanticSearch:
             pickle.dump(self.tfidf_matrix, f)
         with open(self.shop_ids_path, 'wb') as f:
             pickle.dump(self.shop_ids, f)
+        with open(self.state_path, 'wb') as f:
+            pickle.dump(dict(self.encoder.state(), terms=sorted(self.terms)), f)
         print(f"Semantic Search Index saved to {os.path.dirname(self.vectorizer_path)}")
 
     def load(self):
         try:
-            with open(self.vectorizer_path, 'rb') as f:
-                self.vectorizer = pickle.load(f)
+            self.encoder, self.terms = self._load_encoder()
             with open(self.matrix_path, 'rb') as f:
                 self.tfidf_matrix = pickle.load(f)
             with open(self.shop_ids_path, 'rb') as f:
@@ -146,6 +257,49 @@ class SemanticSearch:
             # print("Index files not found or corrupted.")
             pass
 
+    def _load_encoder(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'rb') as f:
+                state = pickle.load(f)
+            encoder = QueryEncoder(state['vocabulary'], state['idf'])
+            # Older state files have no term list; the (capped) vocabulary stands in
+            return encoder, frozenset(state.get('terms') or encoder.vocabulary)
+        # Index built before the state export: fall back to the pickled vectorizer
+        with open(self.vectorizer_path, 'rb') as f:
+            self.vectorizer = pickle.load(f)
+        encoder = QueryEncoder.from_vectorizer(self.vectorizer)
+        return encoder, frozenset(encoder.vocabulary)
+
+_shared_index = None  # (matrix mtime, SemanticSearch)
+_shared_lock = threading.Lock()
+
+
+def get_semantic_search():
+    """Process-wide SemanticSearch, reloaded when the index files are rebuilt.
+
+    A rebuilt index is loaded into a fresh instance and swapped in whole, so
+    a search running meanwhile keeps a consistent encoder, matrix and ids.
+    """
+    global _shared_index
+    try:
+        mtime = os.path.getmtime(os.path.join(config.MODELS_DIR, "tfidf_matrix.pkl"))
+    except OSError:
+        mtime = None
+
+    shared = _shared_index
+    if shared is not None and shared[0] == mtime and shared[1].tfidf_matrix is not None:
+        return shared[1]
+
+    with _shared_lock:
+        shared = _shared_index
+        if shared is None or shared[0] != mtime or shared[1].tfidf_matrix is None:
+            index = SemanticSearch()
+            with span('semantic_load'):
+                index.load()
+            shared = _shared_index = (mtime, index)
+        return shared[1]
+
+
 if __name__ == "__main__":
     # Build index if run directly
     ss = SemanticSearch()
@@ -0,0 +1,128 @@
+"""
+Typo tolerance with a SymSpell-style deletion index.
+
+Every vocabulary term is indexed under the strings obtained by deleting up
+to MAX_DISTANCE characters from its first PREFIX_LENGTH characters. A
+misspelled token generates its own deletions the same way; terms sharing one
+are the only candidates, and each is confirmed with a bounded edit distance.
+A lookup costs a few dozen dict probes whatever the vocabulary size, instead
+of one Levenshtein computation per term.
+
+The word list is every token of the texts the semantic index was built from
+(normalized shop names, products and tags plus their DOMAIN_MAP spellings),
+exported with the index, so corrections follow index rebuilds. It is not
+the TF-IDF vocabulary, which max_features caps: rare shop and product names
+must stay valid words rather than be "corrected" into frequent ones.
+"""
+
+import itertools
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Shortest token corrected at all, and at distance 2
+MIN_TOKEN_LENGTH = 4
+MIN_DISTANCE_2_LENGTH = 8
+
+
+def max_distance_for(token):
+    if len(token) < MIN_TOKEN_LENGTH:
+        return 0
+    return 1 if len(token) < MIN_DISTANCE_2_LENGTH else 2
+
+
+def _deletes(word, max_distance):
+    """word and every string reachable from it by up to max_distance deletions"""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (transpositions count once), or limit + 1 if above it"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class DeletionIndex:
+    def __init__(self, terms, max_distance=MAX_DISTANCE, prefix_length=PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms = frozenset(terms)
+        # NUL-separated, with a leading NUL so prefixes can be found with `in`
+        self._joined = '\x00' + '\x00'.join(sorted(self.terms))
+        index = {}
+        for term in self.terms:
+            for deletion in _deletes(term[:prefix_length], max_distance):
+                index.setdefault(deletion, []).append(term)
+        self._index = index
+
+    def lookup(self, token, max_distance=None):
+        """Vocabulary terms closest to token within max_distance (all tied at the best distance)"""
+        if max_distance is None:
+            max_distance = self.max_distance
+        max_distance = min(max_distance, self.max_distance)
+        if token in self.terms:
+            return [token]
+        if max_distance <= 0:
+            return []
+
+        candidates = set(itertools.chain.from_iterable(
+            self._index.get(deletion, ()) for deletion in _deletes(token[:self.prefix_length], max_distance)))
+        best, matches = max_distance, []
+        for term in candidates:
+            distance = edit_distance(token, term, best)
+            if distance < best:
+                best, matches = distance, [term]
+            elif distance == best:
+                matches.append(term)
+        return sorted(matches)
+
+    def has_partial(self, token):
+        """Whether score_search_text's prefix/substring tier can match token against some term"""
+        if len(token) > 4:
+            return token in self._joined
+        return len(token) > 3 and '\x00' + token in self._joined
+
+    def corrections(self, query_tokens):
+        """{token: frozenset(terms)} for query tokens with no exact or partial vocabulary match.
+
+        Tokens the lexical scorer can already match (whole, or as a prefix
+        while the user is still typing) are left alone.
+        """
+        fuzzy = {}
+        for token in query_tokens:
+            if token in self.terms or self.has_partial(token):
+                continue
+            matches = self.lookup(token, max_distance_for(token))
+            if matches:
+                fuzzy[token] = frozenset(matches)
+        return fuzzy
+
+
+_shared_index = None
+
+
+def get_spelling_index(terms):
+    """Process-wide DeletionIndex over terms (SemanticSearch.terms), rebuilt when the index reloads"""
+    global _shared_index
+    if _shared_index is None or _shared_index[0] is not terms:
+        # Multi-word DOMAIN_MAP spellings ('এস এস') can never equal a query token
+        _shared_index = (terms, DeletionIndex(term for term in terms if ' ' not in term))
+    return _shared_index[1]
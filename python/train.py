@@ -17,7 +17,8 @@ print("====================================")
 artifacts = [
     os.path.join(config.MODELS_DIR, 'tfidf_vectorizer.pkl'),
     os.path.join(config.MODELS_DIR, 'tfidf_matrix.pkl'),
-    os.path.join(config.MODELS_DIR, 'shop_ids.pkl')
+    os.path.join(config.MODELS_DIR, 'shop_ids.pkl'),
+    os.path.join(config.MODELS_DIR, 'tfidf_state.pkl')
 ]
 
 print("Scanning for old artifacts...")
@@ -35,11 +36,13 @@ print("Retraining Model...")
 try:
     ss = SemanticSearch()
     
-    if not os.path.exists(config.DB_PATH):
-        print(f"ERROR: Database not found at {config.DB_PATH}")
-        exit(1)
-        
-    ss.build_index(config.DB_PATH)
+    if config.SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        if not os.path.exists(config.DB_PATH):
+            print(f"ERROR: Database not found at {config.DB_PATH}")
+            exit(1)
+        ss.build_index(config.DB_PATH)
+    else:
+        ss.build_index()
     print("\nSUCCESS: Search Index Rebuilt Successfully!")
     print(f"Artifacts saved in: {config.MODELS_DIR}")
     
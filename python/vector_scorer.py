@@ -0,0 +1,201 @@
+"""
+Vectorized lexical scorer.
+
+Computes search_engine.calculate_score for every shop at once. Shops are
+encoded as a sparse shop x token incidence matrix; per-query work is a few
+column lookups, a scan of the vocabulary for prefix/substring terms and
+array arithmetic instead of a Python loop over shops.
+
+Check it against calculate_score on the bundled data with:
+
+    python python/vector_scorer.py shops_data.json
+"""
+
+import bisect
+import os
+import random
+import sys
+
+import numpy as np
+from scipy import sparse
+
+from search_engine import tokenize, normalize_text, build_search_text, calculate_score, FUZZY_MATCH, FUZZY_SCORE
+
+_SEP = '\x00'
+
+
+def _find_containing(haystack, offsets, needle):
+    """Indices of the NUL-joined items of haystack that contain needle.
+
+    Jumps to the next item after each hit, so the cost is one C-level scan
+    of the haystack rather than one Python `in` per item.
+    """
+    found = []
+    start = haystack.find(needle)
+    while start != -1:
+        index = bisect.bisect_right(offsets, start) - 1
+        found.append(index)
+        if index + 1 >= len(offsets):
+            break
+        start = haystack.find(needle, offsets[index + 1])
+    return found
+
+
+class VectorizedScorer:
+    def __init__(self, rows):
+        """rows: (shop_id, normalized_name, search_text) tuples, in ranking tie order"""
+        self.shop_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.names = [r[1] for r in rows]
+        self.texts = [r[2] for r in rows]
+        self._id_positions = {shop_id: i for i, shop_id in enumerate(self.shop_ids.tolist())}
+
+        self._texts_joined, self._text_offsets = self._join(self.texts)
+
+        vocab = {}
+        indptr = [0]
+        indices = []
+        for text in self.texts:
+            for token in tokenize(text):
+                indices.append(vocab.setdefault(token, len(vocab)))
+            indptr.append(len(indices))
+
+        self.vocab = vocab
+        self.terms = sorted(vocab, key=vocab.get)
+        self._terms_joined, self._term_offsets = self._join(self.terms)
+
+        data = np.ones(len(indices), dtype=np.int8)
+        incidence = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(vocab)))
+        # Column slices are the hot operation
+        self.incidence = incidence.tocsc()
+
+    @staticmethod
+    def _join(items):
+        offsets = []
+        position = 0
+        for item in items:
+            offsets.append(position)
+            position += len(item) + 1
+        return _SEP.join(items), offsets
+
+    def _has_any(self, columns):
+        """Boolean vector: shop contains at least one of the vocabulary columns"""
+        mask = np.zeros(len(self.shop_ids), dtype=bool)
+        if columns:
+            mask[self.incidence[:, columns].indices] = True
+        return mask
+
+    def _partial_columns(self, q_token):
+        """Vocabulary terms the scorer's prefix/substring fallback accepts for q_token"""
+        if len(q_token) <= 3:
+            return []
+        candidates = _find_containing(self._terms_joined, self._term_offsets, q_token)
+        if len(q_token) > 4:
+            return candidates
+        return [c for c in candidates if self.terms[c].startswith(q_token)]
+
+    def lexical_scores(self, query_tokens, normalized_query, fuzzy=None):
+        """calculate_score for every shop, as a float array"""
+        count = len(self.shop_ids)
+        scores = np.zeros(count, dtype=np.float64)
+
+        phrase = _find_containing(self._texts_joined, self._text_offsets, normalized_query)
+        if phrase:
+            scores[phrase] += 50
+            in_name = [i for i in phrase if normalized_query in self.names[i]]
+            scores[in_name] += 30
+
+        matches = np.zeros(count, dtype=np.float64)
+        for q_token in query_tokens:
+            column = self.vocab.get(q_token)
+            exact = self._has_any([column] if column is not None else [])
+            partial = self._has_any(self._partial_columns(q_token)) & ~exact
+            matches += exact + 0.5 * partial
+            scores += 20 * exact + 5 * partial
+            if fuzzy and q_token in fuzzy:
+                columns = [self.vocab[t] for t in fuzzy[q_token] if t in self.vocab]
+                spelled = self._has_any(columns) & ~exact & ~partial
+                matches += FUZZY_MATCH * spelled
+                scores += FUZZY_SCORE * spelled
+
+        query_token_count = len(query_tokens)
+        if query_token_count > 0:
+            scores[matches >= query_token_count] += 100
+        if query_token_count > 1:
+            scores[matches / query_token_count <= 0.5] = 0
+        return scores
+
+    def scores(self, query_tokens, normalized_query, semantic_scores=None, fuzzy=None):
+        """Lexical scores fused with semantic scores (search_engine.fuse_scores)"""
+        scores = self.lexical_scores(query_tokens, normalized_query, fuzzy)
+        if semantic_scores:
+            semantic = np.zeros(len(scores), dtype=np.float64)
+            for shop_id, sem_score in semantic_scores.items():
+                position = self._id_positions.get(shop_id)
+                if position is not None:
+                    semantic[position] = sem_score
+            boosted = (semantic > 0) & (scores > 0)
+            replaced = (semantic > 5) & (scores <= 0)
+            scores = np.where(boosted, scores + (semantic + 20), scores)
+            scores = np.where(replaced, semantic, scores)
+        return scores
+
+    def rank(self, query_tokens, normalized_query, semantic_scores, limit=None, fuzzy=None):
+        """Shop ids with a positive score, best first, ties in row order"""
+        scores = self.scores(query_tokens, normalized_query, semantic_scores, fuzzy)
+        hits = np.flatnonzero(scores > 0)
+        order = hits[np.lexsort((hits, -scores[hits]))]
+        if limit is not None:
+            order = order[:limit]
+        return self.shop_ids[order].tolist()
+
+
+def _sample_queries(shops, count=300, seed=7):
+    rng = random.Random(seed)
+    words = sorted({w for s in shops for w in f"{s['name']} {s['products'] or ''}".replace(',', ' ').split()})
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(' '.join(rng.sample(words, rng.randint(1, 3))))
+        elif kind < 0.7:
+            word = rng.choice(words)
+            queries.append(word[:rng.randint(2, max(2, len(word)))])
+        else:
+            shop = rng.choice(shops)
+            queries.append(shop['name'] if rng.random() < 0.5 else (shop['products'] or shop['name'])[:15])
+    return queries
+
+
+def verify_equivalence(json_path):
+    """Compare against calculate_score shop by shop; returns the mismatches"""
+    import json
+    from spelling import DeletionIndex
+    with open(json_path, 'r', encoding='utf-8') as f:
+        shops = json.load(f)['shops']
+
+    search_data = [{'name': s['name'], 'products': s['products'], 'tags': s.get('tags', [])} for s in shops]
+    rows = [(i, normalize_text(d['name']), build_search_text(d['name'], d['products'], d['tags']))
+            for i, d in enumerate(search_data)]
+    scorer = VectorizedScorer(rows)
+    spelling = DeletionIndex(scorer.terms)
+
+    mismatches = []
+    for query in _sample_queries(shops):
+        normalized_query, query_tokens = normalize_text(query), tokenize(query)
+        fuzzy = spelling.corrections(query_tokens)
+        vectorized = scorer.lexical_scores(query_tokens, normalized_query, fuzzy)
+        for i, data in enumerate(search_data):
+            expected = calculate_score(data, query_tokens, normalized_query, fuzzy)
+            if expected != vectorized[i]:
+                mismatches.append((query, i, expected, float(vectorized[i])))
+    return mismatches
+
+
+if __name__ == '__main__':
+    default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shops_data.json')
+    mismatches = verify_equivalence(sys.argv[1] if len(sys.argv) > 1 else default_path)
+    for query, index, expected, actual in mismatches[:20]:
+        print(f"MISMATCH q={query!r} shop#{index}: calculate_score={expected} vectorized={actual}")
+    if mismatches:
+        sys.exit(1)
+    print("OK: vectorized scores match calculate_score.")
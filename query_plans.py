@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN QUERY PLAN check for the hot lookups in database.py.
+
+Exits non-zero if any of them falls back to a full table scan, so it can gate
+CI after schema or query changes:
+
+    python query_plans.py
+"""
+
+import sys
+
+from sqlalchemy import select, func
+
+from database import Category, Shop, Tag, ShopTag, DataGeneration, make_engine
+
+# Statements mirroring the point lookups made by ExtendedSQLAlchemy.
+# search_shops scans every shop by design and is not listed.
+HOT_QUERIES = {
+    'add_category': select(Category).where(Category.name == 'x'),
+    'get_shop_by_id': select(Shop).where(Shop.id == 1),
+    'get_shops_by_category': select(Shop).where(Shop.category_id == 1).order_by(Shop.id),
+    'shop by serial_no': select(Shop).where(Shop.category_id == 1, Shop.serial_no == '1'),
+    'add_tag': select(Tag).where(Tag.name == 'x'),
+    'search_shops_by_tag': select(Tag).where(func.lower(Tag.name) == 'x'),
+    'add_shop_tag': select(ShopTag).where(ShopTag.shop_id == 1, ShopTag.tag_id == 1),
+    'delete_tag': select(ShopTag).where(ShopTag.tag_id == 1),
+    'export_shops updated_since': (select(Shop).where(Shop.updated_at > '2000-01-01')
+                                   .order_by(Shop.updated_at, Shop.id)),
+    'get_generations': select(DataGeneration).where(DataGeneration.scope.in_(['shops', 'categories'])),
+}
+
+
+def explain(conn, statement):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+def find_full_scans(engine):
+    """Map each hot query that full-scans a table to its plan"""
+    failures = {}
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            plan = explain(conn, statement)
+            if any(step.startswith('SCAN') and 'INDEX' not in step for step in plan):
+                failures[name] = plan
+    return failures
+
+
+def main():
+    engine = make_engine()
+    if engine.dialect.name != 'sqlite':
+        print(f"EXPLAIN QUERY PLAN check only supports SQLite (got {engine.dialect.name}).")
+        return 0
+
+    failures = find_full_scans(engine)
+    for name, plan in failures.items():
+        print(f"FULL SCAN: {name}")
+        for step in plan:
+            print(f"    {step}")
+
+    if failures:
+        return 1
+    print(f"OK: {len(HOT_QUERIES)} hot queries use indexes.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
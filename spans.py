@@ -0,0 +1,76 @@
+"""
+Stage timing spans for the hot path.
+
+Kept free of Flask and SQLAlchemy so the semantic query path can time its
+stages without importing either; metrics.py renders STAGE_SECONDS and
+attaches the per-request breakdown.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage breakdown of the running request (None outside requests)
+_request_stages = contextvars.ContextVar('metrics_request_stages', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by one label"""
+
+    def __init__(self, name, help_text, label, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {key: list(values) for key, values in sorted(self._series.items())}
+        for label_value, series in snapshot.items():
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{label}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{label}}} {series[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('search_stage_duration_seconds', 'Time spent per hot-path stage.', 'stage')
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Time a block as `stage`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def record(stage, seconds):
+    STAGE_SECONDS.observe(stage, seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
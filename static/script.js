@@ -46,6 +46,39 @@ document.addEventListener('DOMContentLoaded', function () {
         searchInput.addEventListener('blur', function () {
             this.parentElement.classList.remove('focused');
         });
+
+        // Autocomplete from /api/suggest
+        const suggestUrl = searchInput.dataset.suggestUrl;
+        const suggestions = document.getElementById('searchSuggestions');
+        let suggestTimer = null;
+        let suggestRequest = null;
+        if (suggestUrl && suggestions) {
+            searchInput.addEventListener('input', function () {
+                clearTimeout(suggestTimer);
+                const query = this.value.trim();
+                if (!query) {
+                    suggestions.innerHTML = '';
+                    return;
+                }
+                suggestTimer = setTimeout(() => {
+                    if (suggestRequest) {
+                        suggestRequest.abort();
+                    }
+                    suggestRequest = new AbortController();
+                    fetch(suggestUrl + '?q=' + encodeURIComponent(query), { signal: suggestRequest.signal })
+                        .then(response => response.json())
+                        .then(data => {
+                            suggestions.innerHTML = '';
+                            data.suggestions.forEach(item => {
+                                const option = document.createElement('option');
+                                option.value = item.text;
+                                suggestions.appendChild(option);
+                            });
+                        })
+                        .catch(() => {});
+                }, 120);
+            });
+        }
     }
 
     // Confirm delete
@@ -0,0 +1,257 @@
+"""
+Autocomplete for the search box (/api/suggest).
+
+Suggestions come from one sorted array of (normalized key, kind, display)
+entries, searched with bisect:
+
+    shop     shop names, keyed by the full name and by each later word
+    tag      tag names and Bengali names
+    product  words of the shops' product lists
+    term     DOMAIN_MAP keys
+
+An entry's popularity is the number of shops carrying it (for tags, the
+tag's shop count; for terms, the shops carrying the term or any of its
+synonyms), scaled by a per-kind boost. Writes reach the index through the
+change log: only the shops and tags they touched are updated in place.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+from collections import Counter
+
+from database import query_change_rows, query_last_change_seq, query_suggest_shops, query_tag_counts
+from search_engine import DOMAIN_MAP, SYNONYMS, normalize_text
+
+KIND_BOOST = {'shop': 3, 'tag': 2, 'product': 1, 'term': 1}
+_WORD_SPLIT = re.compile(r'\s+|[,;.]+')
+
+
+def shop_entries(name, products):
+    """Entries one shop contributes: its name (and name suffixes) and product words"""
+    entries = set()
+    name = (name or '').strip()
+    words = name.split()
+    for start in range(len(words)):
+        key = normalize_text(' '.join(words[start:]))
+        if key:
+            entries.add((key, 'shop', name))
+    for word in _WORD_SPLIT.split((products or '').lower().strip()):
+        key = normalize_text(word)
+        if key:
+            entries.add((key, 'product', word))
+    return frozenset(entries)
+
+
+def tag_entries(name, name_bn):
+    return {(normalize_text(text), 'tag', text.strip()) for text in (name, name_bn) if normalize_text(text)}
+
+
+class SuggestIndex:
+    """Sorted (key, kind, display) entries with reference counts; not thread-safe on its own"""
+
+    # Entries looked at per lookup; bounds the cost of one- or two-letter prefixes
+    SCAN_LIMIT = 20000
+    # Prefixes spanning more entries than this keep their ranked suggestions
+    # (CACHE_DEPTH of them) until an entry under the prefix changes
+    CACHE_MIN_ENTRIES = 500
+    CACHE_DEPTH = 20
+
+    def __init__(self, shops=(), tags=()):
+        """shops: (shop_id, name, products); tags: (name, name_bn, shop_count)"""
+        self._entries = []
+        self._refs = Counter()          # entry -> number of sources holding it
+        self._shop_entries = {}         # shop_id -> frozenset of entries
+        self._tag_weights = {}          # tag entry -> shop count
+        self._product_counts = Counter()  # product key -> shops carrying it
+        self._cache = {}                # prefix -> ranked suggestions
+
+        counts = Counter()
+        for shop_id, name, products in shops:
+            entries = shop_entries(name, products)
+            self._shop_entries[shop_id] = entries
+            counts.update(entries)
+        for name, name_bn, shop_count in tags:
+            for entry in tag_entries(name, name_bn):
+                self._tag_weights[entry] = self._tag_weights.get(entry, 0) + shop_count
+        counts.update(self._tag_weights.keys())
+        counts.update((normalize_text(key), 'term', key) for key in DOMAIN_MAP)
+
+        self._refs = counts
+        self._entries = sorted(counts)
+        for (key, kind, _), count in counts.items():
+            if kind == 'product':
+                self._product_counts[key] += count
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _invalidate(self, key):
+        for end in range(1, len(key) + 1):
+            self._cache.pop(key[:end], None)
+
+    def _changed(self, entry):
+        """Drop cached suggestions an entry's presence or weight can affect"""
+        key, kind, _ = entry
+        self._invalidate(key)
+        if kind == 'product':
+            # Terms are weighted by the product counts of their synonyms
+            for synonym in SYNONYMS.get(key, ()):
+                self._invalidate(synonym)
+
+    def _add(self, entry):
+        self._changed(entry)
+        self._refs[entry] += 1
+        if self._refs[entry] == 1:
+            bisect.insort(self._entries, entry)
+        if entry[1] == 'product':
+            self._product_counts[entry[0]] += 1
+
+    def _remove(self, entry):
+        self._changed(entry)
+        self._refs[entry] -= 1
+        if self._refs[entry] <= 0:
+            del self._refs[entry]
+            position = bisect.bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+        if entry[1] == 'product':
+            self._product_counts[entry[0]] -= 1
+            if self._product_counts[entry[0]] <= 0:
+                del self._product_counts[entry[0]]
+
+    def update_shop(self, shop_id, name=None, products=None, deleted=False):
+        """Replace one shop's entries (or drop them when deleted)"""
+        old = self._shop_entries.pop(shop_id, frozenset())
+        new = frozenset() if deleted else shop_entries(name, products)
+        if new:
+            self._shop_entries[shop_id] = new
+        for entry in old - new:
+            self._remove(entry)
+        for entry in new - old:
+            self._add(entry)
+
+    def update_tags(self, tags):
+        """Replace every tag entry from (name, name_bn, shop_count) rows"""
+        weights = {}
+        for name, name_bn, shop_count in tags:
+            for entry in tag_entries(name, name_bn):
+                weights[entry] = weights.get(entry, 0) + shop_count
+        for entry in self._tag_weights.keys() - weights.keys():
+            self._remove(entry)
+        for entry in weights.keys() - self._tag_weights.keys():
+            self._add(entry)
+        for entry in weights.keys() & self._tag_weights.keys():
+            if weights[entry] != self._tag_weights[entry]:
+                self._changed(entry)
+        self._tag_weights = weights
+
+    def _weight(self, entry):
+        key, kind, _ = entry
+        if kind == 'tag':
+            popularity = self._tag_weights.get(entry, 0)
+        elif kind == 'term':
+            popularity = self._product_counts.get(key, 0) + sum(
+                self._product_counts.get(synonym, 0) for synonym in SYNONYMS.get(key, ()))
+        else:
+            popularity = self._refs[entry]
+        return (1 + popularity) * KIND_BOOST[kind]
+
+    def suggest(self, query, limit=8):
+        """Best entries whose key starts with the normalized query: [{'text', 'type'}]"""
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        cached = self._cache.get(prefix)
+        if cached is not None and len(cached) >= limit:
+            return cached[:limit]
+
+        start = bisect.bisect_left(self._entries, (prefix,))
+        end = min(len(self._entries), start + self.SCAN_LIMIT)
+        best = {}  # display -> (sort key, kind)
+        scanned = 0
+        for position in range(start, end):
+            key, kind, display = entry = self._entries[position]
+            if not key.startswith(prefix):
+                break
+            scanned += 1
+            # Most popular first, then the shortest completion, then alphabetical
+            rank = (-self._weight(entry), len(key), display)
+            if display not in best or rank < best[display][0]:
+                best[display] = (rank, kind)
+
+        depth = max(limit, self.CACHE_DEPTH) if scanned > self.CACHE_MIN_ENTRIES else limit
+        top = [{'text': rank[2], 'type': kind} for rank, kind in heapq.nsmallest(depth, best.values())]
+        if depth > limit:
+            self._cache[prefix] = top
+        return top[:limit]
+
+
+class Suggester:
+    """Keeps a SuggestIndex in step with the database for the Flask app.
+
+    Each lookup first replays the change log entries written since the
+    index last caught up (one primary-key range query, usually empty), so
+    writes from any worker reach every worker's index incrementally.
+    """
+
+    # Past this many pending changes (or on a directory reset) rebuild instead
+    REBUILD_AFTER_CHANGES = 5000
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.index = None
+        self.max_limit = 20
+        self._seq = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.db = db or self.db
+        self.max_limit = app.config.get('SUGGEST_MAX_LIMIT', 20)
+        app.extensions['suggester'] = self
+
+    def prime(self):
+        """Build the index now (worker warm-up) instead of on the first lookup"""
+        with self._lock:
+            self._catch_up()
+
+    def suggest(self, query, limit=8):
+        limit = max(1, min(limit, self.max_limit))
+        with self._lock:
+            self._catch_up()
+            return self.index.suggest(query, limit)
+
+    def _rebuild(self):
+        session = self.db.session
+        # Read the log position first: changes racing the build are replayed later
+        self._seq = query_last_change_seq(session)
+        self.index = SuggestIndex(query_suggest_shops(session), query_tag_counts(session))
+
+    def _catch_up(self):
+        if self.index is None:
+            return self._rebuild()
+
+        session = self.db.session
+        rows = query_change_rows(session, self._seq, self.REBUILD_AFTER_CHANGES)
+        if not rows:
+            return
+        if len(rows) >= self.REBUILD_AFTER_CHANGES or any(row.entity == 'directory' for row in rows):
+            return self._rebuild()
+
+        shop_ids = sorted({row.entity_id for row in rows if row.entity == 'shop'})
+        found = {}
+        if shop_ids:
+            found = {shop_id: (name, products)
+                     for shop_id, name, products in query_suggest_shops(session, shop_ids)}
+        for shop_id in shop_ids:
+            if shop_id in found:
+                self.index.update_shop(shop_id, *found[shop_id])
+            else:
+                self.index.update_shop(shop_id, deleted=True)
+        # A deleted shop also drops out of its tags' shop counts
+        if len(found) < len(shop_ids) or any(row.entity == 'tag' for row in rows):
+            self.index.update_tags(query_tag_counts(session))
+        self._seq = rows[-1].seq
@@ -0,0 +1,55 @@
+"""
+Worker warm-up: pay the first-request costs before the worker serves traffic.
+
+Compiles every Jinja template, loads the translation catalogs for each
+supported locale and primes the category cache, the semantic search index,
+the spelling index built from its term list and the autocomplete index.
+"""
+
+import time
+
+from flask_babel import force_locale, get_translations
+
+SUPPORTED_LOCALES = ('bn', 'en')
+
+
+def precompile_templates(app):
+    """Compile every HTML template into the Jinja environment cache"""
+    env = app.jinja_env
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def load_translations(app, locales=SUPPORTED_LOCALES):
+    """Load each locale's catalog into flask_babel's per-process cache"""
+    with app.test_request_context():
+        for locale in locales:
+            with force_locale(locale):
+                get_translations()
+
+
+def warm_up(app, db):
+    """Run every warm-up step and record how long it took"""
+    from semantic_search import get_semantic_search
+    from spelling import get_spelling_index
+
+    start = time.perf_counter()
+
+    template_count = precompile_templates(app)
+    load_translations(app)
+
+    with app.app_context():
+        db.get_all_categories()
+        suggester = app.extensions.get('suggester')
+        if suggester is not None:
+            suggester.prime()
+    semantic = get_semantic_search()
+    if semantic.terms is not None:
+        get_spelling_index(semantic.terms)
+
+    duration = time.perf_counter() - start
+    app.config['WARMUP_SECONDS'] = duration
+    print(f"Warm-up: compiled {template_count} templates, loaded {len(SUPPORTED_LOCALES)} catalogs in {duration:.3f}s")
+    return duration